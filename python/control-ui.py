@@ -5,11 +5,10 @@ import pathlib
 # import time
 # import signal # to handle key kill
 import logging
+import logging.handlers
+import atexit
 import systemd.journal
 import pprint
-import matplotlib
-matplotlib.use('svg')  # or 'GTK3Cairo'
-import matplotlib.pyplot as plt
 
 # for merging dictionaries
 from boltons.iterutils import default_enter
@@ -24,15 +23,30 @@ import drawSvg as draw
 import sys
 import os
 import time
+import timeit
 import math
 import humanize
 import datetime as dt
 import paho.mqtt.client as mqtt
+import queue
+import collections
+import threading
+import concurrent.futures
+import uuid
 import pickle
+import sqlite3
+import json
+import hashlib
 import pandas as pd
 import numpy as np
 from io import BytesIO
 
+# for the compact wire format (optional, pickle is used without it)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 import yaml
 
 import re
@@ -43,9 +57,11 @@ gi.require_version("WebKit2", "4.0")
 gi.require_version("Gtk", "3.0")
 gi.require_version('Rsvg', '2.0')
 from gi.repository import GLib, Gio, Gtk, Gdk, Rsvg
+import cairo
 
 # Gdk.set_allowed_backends('broadway')  # for gui over web
 from gi.repository.WebKit2 import WebView, Settings
+from gi.repository import WebKit2
 
 # needed to filter out a stupid bug-warning in gio
 # https://bugzilla.gnome.org/show_bug.cgi?id=708676
@@ -53,6 +69,183 @@ from gi.repository.WebKit2 import WebView, Settings
 import warnings
 warnings.filterwarnings('ignore', '.*g_value_get_int.*G_VALUE_HOLDS_INT.*', Warning)
 
+class FloodControl(object):
+    """
+    Rate limits and de-duplicates log records per source (a record's source attribute, or else its logger name).
+    Each source has a bucket of burst records that refills at rate records per second. Records below WARNING that find
+    it empty get dropped and counted (warnings and errors always get through), and a note saying how many were lost
+    goes out with the next one that does, or once the source has been quiet for hold seconds.
+    A record with the same level and message as the last one from its source is held back and counted instead,
+    and a "repeated N times" record goes out when something different comes along or hold seconds have passed.
+    """
+
+    def __init__(self, rate=50, burst=200, hold=2.0):
+        self.rate = rate
+        self.burst = burst
+        self.hold = hold
+        self.sources = {}  # source --> its bucket, drop and repeat counts
+        self.dropped = 0  # records dropped since we started
+
+    # a new record carrying a note about source
+    @staticmethod
+    def note(like, source, level, msg):
+        return logging.makeLogRecord({'name': like.name, 'levelno': level, 'levelname': logging.getLevelName(level), 'msg': msg, 'source': source})
+
+    # the "repeated N times" record for a source, if it has repeats waiting
+    def repeats(self, source, st):
+        if st['repeats'] == 0:
+            return []
+        record = self.note(st['record'], source, st['record'].levelno, f"Last message repeated {st['repeats']} times")
+        st['repeats'] = 0
+        return [record]
+
+    # the "dropped N" record for a source, if it has dropped any since the last one
+    def drops(self, source, st):
+        if st['dropped'] == 0:
+            return []
+        record = self.note(st['like'], source, logging.WARNING, f"Dropped {st['dropped']} log messages from {source} (more than {self.rate} per second)")
+        st['dropped'] = 0
+        return [record]
+
+    # what should be handled in place of a record (it, nothing or it with some notes before it)
+    def process(self, record, now=None):
+        now = time.monotonic() if now is None else now
+        source = getattr(record, 'source', record.name)
+        st = self.sources.get(source)
+        if st is None:
+            st = {'tokens': self.burst, 'time': now, 'dropped': 0, 'record': None, 'key': None, 'repeats': 0, 'since': now, 'like': record}
+            self.sources[source] = st
+        st['like'] = record  # the last record seen from this source, to base notes on
+        key = (record.levelno, record.getMessage())
+        if key == st['key']:
+            if st['repeats'] == 0:
+                st['since'] = now  # when this run of repeats started
+            st['repeats'] += 1
+            return []
+        out = self.repeats(source, st)
+        st['tokens'] = min(self.burst, st['tokens'] + (now - st['time'])*self.rate)
+        st['time'] = now
+        if record.levelno >= logging.WARNING:
+            st['tokens'] = max(st['tokens'] - 1, 0)  # these count against the rate but never get dropped
+        elif st['tokens'] < 1:
+            st['dropped'] += 1
+            self.dropped += 1
+            st['key'] = None  # so we don't count repeats of something nobody saw
+            return out
+        else:
+            st['tokens'] -= 1
+        out += self.drops(source, st)
+        st['record'] = record
+        st['key'] = key
+        out.append(record)
+        return out
+
+    # "repeated N times" records for runs of repeats that started hold seconds ago or more
+    # and "dropped N" records for sources that have gone quiet for hold seconds since dropping some
+    def expire(self, now=None):
+        now = time.monotonic() if now is None else now
+        out = []
+        for source, st in self.sources.items():
+            if (st['repeats'] > 0) and (now - st['since'] >= self.hold):
+                out += self.repeats(source, st)
+            if (st['dropped'] > 0) and (now - st['time'] >= self.hold):
+                out += self.drops(source, st)
+        return out
+
+
+class LogPipeline(logging.handlers.QueueHandler):
+    """
+    A logging handler that only puts records on a queue, so logging never waits on a slow handler.
+    A listener thread hands every record to the handlers added with flood_control=False (like the log archive),
+    then runs it through FloodControl and hands what's left to the rest of the real handlers.
+    Records that find the queue full are dropped, counted and reported once there's room again.
+    """
+
+    def __init__(self, handlers=(), maxsize=10000, flood=None):
+        super().__init__(queue.Queue(maxsize))
+        self.targets = list(handlers)
+        self.unfiltered = []  # handlers that get every record, ahead of flood control
+        self.targets_lock = threading.Lock()
+        self.flood = FloodControl() if flood is None else flood
+        self.overflowed = 0  # records that found the queue full
+        self.reported = 0  # how many of those we've said were lost
+        self.thread = threading.Thread(target=self.run, name="log pipeline", daemon=True)
+        self.thread.start()
+
+    # records dropped in total
+    @property
+    def dropped(self):
+        return self.overflowed + self.flood.dropped
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.overflowed += 1
+
+    def add_handler(self, handler, flood_control=True):
+        with self.targets_lock:
+            if flood_control == True:
+                self.targets.append(handler)
+            else:
+                self.unfiltered.append(handler)
+
+    def remove_handler(self, handler):
+        with self.targets_lock:
+            for targets in [self.targets, self.unfiltered]:
+                if handler in targets:
+                    targets.remove(handler)
+
+    # the handler with a given name, or None
+    def get_handler(self, name):
+        with self.targets_lock:
+            return next((h for h in self.targets + self.unfiltered if h.get_name() == name), None)
+
+    # passes a record to the real handlers, only those behind flood control unless unfiltered is True
+    def dispatch(self, record, unfiltered=False):
+        with self.targets_lock:
+            targets = list(self.unfiltered if unfiltered == True else self.targets)
+        for h in targets:
+            if record.levelno >= h.level:
+                h.handle(record)
+
+    # the listener thread
+    def run(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                record = False
+            if record is None:
+                break
+            records = self.flood.expire()
+            if record:
+                self.dispatch(record, unfiltered=True)
+                records += self.flood.process(record)
+            else:  # a quiet moment for the handlers to write out anything they're holding on to
+                with self.targets_lock:
+                    targets = self.targets + self.unfiltered
+                for h in targets:
+                    h.flush()
+            if self.overflowed > self.reported:
+                lost = self.overflowed - self.reported
+                self.reported = self.overflowed
+                note = FloodControl.note(lg, "logging", logging.WARNING, f"Dropped {lost} log messages (logging queue full)")
+                self.dispatch(note, unfiltered=True)  # nobody got these
+                records.append(note)
+            for r in records:
+                self.dispatch(r)
+
+    # handles what's queued and ends the listener thread
+    def stop(self):
+        if self.thread.is_alive():
+            try:
+                self.queue.put(None, timeout=1)
+            except queue.Full:
+                pass
+            self.thread.join(timeout=2)
+
+
 # setup logging
 lg = logging.getLogger("control-ui")
 lg.setLevel(logging.DEBUG)
@@ -63,8 +256,2266 @@ uiLogFormat = logging.Formatter(("%(asctime)s|%(levelname)s|%(message)s"))
 sysLogFormat = logging.Formatter(("%(levelname)s|%(message)s"))
 sysL.setFormatter(sysLogFormat)
 ch.setFormatter(logFormat)
-lg.addHandler(ch)
-lg.addHandler(sysL)
+# the handlers run on their own thread, behind a queue
+logPipe = LogPipeline([ch, sysL])
+lg.addHandler(logPipe)
+atexit.register(logPipe.stop)
+
+
+PIXEL_TABLE_MAGIC = b'PXT1'
+
+
+# packs a pixel dataframe column by column into one buffer:
+# MAGIC, a 4 byte header length, a msgpack header describing the columns, then the raw column buffers (8 byte aligned)
+# number columns are stored as plain arrays, equal length list columns (like loc) as fixed width float64 2d arrays
+# and string columns are dictionary encoded (a list of categories + int32 codes)
+# anything else (like the user_vars dicts) goes into the header as a list
+def pack_pixel_table(df):
+    buffers = []
+    offset = 0
+
+    def add_buffer(a):
+        nonlocal offset
+        a = np.ascontiguousarray(a)
+        spec = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+        buffers.append(a.data)
+        offset += a.nbytes
+        pad = (-offset) % 8
+        if pad > 0:
+            buffers.append(bytes(pad))
+            offset += pad
+        return spec
+
+    header = {'n': len(df), 'index_name': df.index.name, 'columns': []}
+    if pd.api.types.is_integer_dtype(df.index.dtype):
+        header['index'] = add_buffer(df.index.to_numpy(dtype=np.int64))
+    else:
+        header['index'] = df.index.tolist()
+
+    for name in df.columns:
+        col = df[name]
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            spec = {'kind': 'dict', 'categories': col.cat.categories.tolist(), 'codes': add_buffer(col.cat.codes.to_numpy(dtype=np.int32))}
+        elif col.dtype.kind in 'biuf':
+            spec = {'kind': 'num', 'buffer': add_buffer(col.to_numpy())}
+        else:
+            values = col.tolist()
+            spec = {'kind': 'obj', 'values': values}  # the fallback
+            if len(values) == 0:
+                pass
+            elif all(isinstance(v, str) for v in values):
+                codes, uniques = pd.factorize(col)
+                spec = {'kind': 'dict', 'categories': uniques.tolist(), 'codes': add_buffer(codes.astype(np.int32))}
+            elif all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                spec = {'kind': 'num', 'buffer': add_buffer(np.asarray(values))}
+            elif all(isinstance(v, (list, tuple, np.ndarray)) for v in values):
+                widths = set(len(v) for v in values)
+                if len(widths) == 1:
+                    try:
+                        spec = {'kind': 'vec', 'buffer': add_buffer(np.array(values, dtype=np.float64).reshape(len(values), widths.pop()))}
+                    except (TypeError, ValueError):
+                        pass  # not numbers
+        spec['name'] = name
+        header['columns'].append(spec)
+
+    head = msgpack.packb(header, default=WireFormat._pack_plain, use_bin_type=True)
+    start = len(PIXEL_TABLE_MAGIC) + 4 + len(head)
+    pad = bytes((-start) % 8)
+    return b''.join([PIXEL_TABLE_MAGIC, len(head).to_bytes(4, 'little'), head, pad] + buffers)
+
+
+# the reverse of pack_pixel_table. the columns are numpy views straight into buf, nothing gets copied
+def unpack_pixel_table(buf):
+    buf = memoryview(buf)
+    if bytes(buf[:len(PIXEL_TABLE_MAGIC)]) != PIXEL_TABLE_MAGIC:
+        raise ValueError("Not a packed pixel table")
+    head_len = int.from_bytes(buf[len(PIXEL_TABLE_MAGIC):len(PIXEL_TABLE_MAGIC)+4], 'little')
+    start = len(PIXEL_TABLE_MAGIC) + 4
+    header = msgpack.unpackb(buf[start:start+head_len], raw=False, strict_map_key=False)
+    start += head_len
+    start += (-start) % 8
+
+    def get_buffer(spec):
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        a = np.frombuffer(buf, dtype=dtype, count=count, offset=start+spec['offset'])
+        return a.reshape(spec['shape'])
+
+    if isinstance(header['index'], dict):
+        index = pd.Index(get_buffer(header['index']), copy=False)
+    else:
+        index = pd.Index(header['index'])
+    cols = {}
+    for spec in header['columns']:
+        kind = spec['kind']
+        if kind == 'num':
+            cols[spec['name']] = get_buffer(spec['buffer'])
+        elif kind == 'dict':
+            cols[spec['name']] = pd.Categorical.from_codes(get_buffer(spec['codes']), categories=spec['categories'])
+        else:
+            if kind == 'vec':
+                values = get_buffer(spec['buffer'])  # each row becomes a view of one row of the 2d array
+            else:
+                values = spec['values']
+            col = np.empty(header['n'], dtype=object)
+            for i, v in enumerate(values):
+                col[i] = v
+            cols[spec['name']] = col
+    df = pd.DataFrame(cols, index=index, copy=False)
+    df.index.name = header['index_name']
+    return df
+
+
+class WireFormat(object):
+    """
+    Encodes and decodes MQTT payloads.
+    Payloads in the new format start with a short header: MAGIC, a format version byte and a codec ID byte.
+    Payloads without the header are plain pickles, which is what old backends send and expect.
+    In "auto" mode we keep sending plain pickles until the backend shows (with a header) that it can take more.
+    """
+
+    MAGIC = b'CU'
+    VERSION = 1
+    PICKLE = 0
+    MSGPACK = 1
+
+    # msgpack extension type codes
+    EXT_NDARRAY = 1
+    EXT_DATAFRAME = 2
+
+    # the keys (and their types) a message must have on a given topic
+    # a value type of None means anything goes
+    schemas = {
+        'measurement/status': str,
+        'measurement/log': {'level': int, 'msg': str},
+        'measurement/run': {'cmd': str, 'args': dict, 'config_hash': str},
+        'measurement/calibrate_eqe': {'cmd': str, 'args': dict, 'config_hash': str},
+        'measurement/calibrate_psu': {'cmd': str, 'args': dict, 'config_hash': str},
+        'config/miss': str,
+        'config': dict,
+        'calibration/eqe': {'timestamp': (int, float)},
+        'calibration/psu': {'timestamp': (int, float)},
+        'calibration/spectrum': {'timestamp': (int, float), 'data': None},
+        'cmd/util': {'cmd': str},
+        'cmd/uitl': {'cmd': str},
+        'plotter': bool,
+        'plotter/rate': (int, float),
+    }
+
+    def __init__(self, mode="auto"):
+        self.mode = mode  # "auto", "pickle" or "msgpack"
+        if (mode != "pickle") and (msgpack is None):
+            if mode == "msgpack":
+                lg.warning("msgpack is not installed. Falling back to pickle wire format")
+            self.mode = "pickle"
+        self.peer_codecs = set()  # codecs we've seen the backend use
+        self.peer_version = None  # newest header version we've seen from the backend
+
+    # which codec we'll use for sending
+    @property
+    def codec(self):
+        if self.mode == "msgpack":
+            return self.MSGPACK
+        elif (self.mode == "auto") and (self.MSGPACK in self.peer_codecs):
+            return self.MSGPACK
+        else:
+            return self.PICKLE
+
+    # finds the schema for a topic by checking it and then its parents
+    def schema(self, topic):
+        parts = topic.split('/')
+        for i in range(len(parts), 0, -1):
+            s = self.schemas.get('/'.join(parts[:i]), False)
+            if s is not False:
+                return s
+        return False
+
+    # checks an object against the schema for its topic
+    def conforms(self, topic, obj):
+        s = self.schema(topic)
+        if s is False:
+            return True  # no schema to check
+        if isinstance(s, dict):
+            if not isinstance(obj, dict):
+                return False
+            for key, typ in s.items():
+                if key not in obj:
+                    return False
+                if (typ is not None) and (not isinstance(obj[key], typ)):
+                    return False
+            return True
+        return isinstance(obj, s)
+
+    def encode(self, topic, obj):
+        if not self.conforms(topic, obj):
+            lg.debug(f"Outbound message for {topic} does not match its schema")
+        if self.codec == self.MSGPACK:
+            body = msgpack.packb(obj, default=self._pack_default, use_bin_type=True)
+            return self.MAGIC + bytes([self.VERSION, self.MSGPACK]) + body
+        elif self.peer_version is not None:
+            return self.MAGIC + bytes([self.VERSION, self.PICKLE]) + pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        else:  # legacy, no header
+            return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # returns None for anything we can't understand or that doesn't fit its topic's schema
+    def decode(self, topic, payload):
+        try:
+            if payload[:len(self.MAGIC)] == self.MAGIC:
+                version = payload[len(self.MAGIC)]
+                codec = payload[len(self.MAGIC)+1]
+                body = memoryview(payload)[len(self.MAGIC)+2:]
+                if (self.peer_version is None) or (version > self.peer_version):
+                    if version > self.VERSION:
+                        lg.debug(f"Backend speaks a newer wire format version ({version}) than us ({self.VERSION})")
+                    self.peer_version = version
+                self.peer_codecs.add(codec)
+                if codec == self.MSGPACK:
+                    obj = msgpack.unpackb(body, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+                elif codec == self.PICKLE:
+                    obj = pickle.loads(body)
+                else:
+                    return None
+            else:
+                obj = pickle.loads(payload)
+        except:
+            return None
+        if not self.conforms(topic, obj):
+            lg.debug(f"Dropping message on {topic} that does not match its schema")
+            return None
+        return obj
+
+    # teaches msgpack about the things we send that it doesn't know
+    def _pack_default(self, obj):
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.hasobject:
+                return obj.tolist()
+            a = np.ascontiguousarray(obj)
+            return msgpack.ExtType(self.EXT_NDARRAY, msgpack.packb([a.dtype.str, a.shape, a.data], use_bin_type=True))
+        elif isinstance(obj, pd.DataFrame):
+            return msgpack.ExtType(self.EXT_DATAFRAME, pack_pixel_table(obj))
+        return self._pack_plain(obj)
+
+    # for things that can be written as plain msgpack types
+    @staticmethod
+    def _pack_plain(obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        elif isinstance(obj, np.generic):
+            return obj.item()
+        elif isinstance(obj, pathlib.PurePath):
+            return str(obj)
+        elif isinstance(obj, (set, frozenset)):
+            return list(obj)
+        raise TypeError(f"Can't put {type(obj)} on the wire")
+
+    def _ext_hook(self, code, data):
+        if code == self.EXT_NDARRAY:
+            dtype, shape, buf = msgpack.unpackb(data, raw=False)
+            return np.frombuffer(buf, dtype=np.dtype(dtype)).reshape(shape)
+        elif code == self.EXT_DATAFRAME:
+            return unpack_pixel_table(data)
+        return msgpack.ExtType(code, data)
+
+
+class PixelGeometry(object):
+    """
+    The pixel geometry of every layout in the config, stored as flat arrays
+    so that the pixel table for any device selection can be built with one vectorized gather
+    """
+
+    def __init__(self, layouts):
+        self.offsets = {}  # layout name --> index of its first pixel in the flat arrays
+        self.sizes = {}  # layout name --> number of pixels on it
+        pads = []
+        areas = []
+        dark_areas = []
+        locations = []
+        shapes = []
+        for name, val in layouts.items():
+            try:
+                lpads = list(val['pads'])
+                lareas = list(val['areas'])
+                ldark_areas = list(val['dark_areas'])
+                llocations = [list(loc) for loc in val['locations']]
+                assert len(lpads) == len(lareas) == len(ldark_areas) == len(llocations)
+            except:
+                lg.debug(f"Skipping incomplete layout: {name}")
+                continue
+            try:
+                lshapes = list(val['shapes'])
+                assert len(lshapes) == len(lpads)
+            except:
+                lshapes = ['s']*len(lpads)
+            self.offsets[name] = len(pads)
+            self.sizes[name] = len(lpads)
+            pads += lpads
+            areas += lareas
+            dark_areas += ldark_areas
+            locations += llocations
+            shapes += lshapes
+        width = max([len(loc) for loc in locations], default=0)
+        self.pads = np.array(pads, dtype=np.int64)
+        self.areas = np.array(areas, dtype=np.float64)
+        self.dark_areas = np.array(dark_areas, dtype=np.float64)
+        self.locations = np.zeros((len(locations), width), dtype=np.float64)
+        for i, loc in enumerate(locations):
+            self.locations[i, :len(loc)] = loc
+
+        # the light mask openings, as drawn by draw_layout: half width, half height and if they're round
+        self.half_sizes = np.zeros((len(shapes), 2), dtype=np.float64)
+        self.round = np.zeros(len(shapes), dtype=bool)
+        mm2 = self.areas * 100  # cm^2 to mm^2
+        for i, shape in enumerate(shapes):
+            if shape == 'c':
+                self.half_sizes[i] = math.sqrt(mm2[i]/math.pi)
+                self.round[i] = True
+            elif isinstance(shape, float):
+                self.half_sizes[i] = [shape/2, mm2[i]/shape/2]
+            else:
+                self.half_sizes[i] = math.sqrt(mm2[i])/2
+
+    # the rows in the flat arrays of the given pixels
+    # layouts is the layout name of each slot
+    # raises KeyError for a slot with an unknown layout and IndexError for a pixel that isn't on its slot's layout
+    def rows(self, subi, pixi, layouts):
+        subi = np.asarray(subi, dtype=np.int64)
+        pixi = np.asarray(pixi, dtype=np.int64)
+        slot_starts = np.zeros(len(layouts), dtype=np.int64)
+        slot_sizes = np.zeros(len(layouts), dtype=np.int64)
+        for i in np.unique(subi).tolist():  # only the slots in use need a known layout
+            slot_starts[i] = self.offsets[layouts[i]]
+            slot_sizes[i] = self.sizes[layouts[i]]
+        bad = (pixi < 0) | (pixi >= slot_sizes[subi])
+        if np.any(bad):
+            i = np.flatnonzero(bad)[0]
+            raise IndexError(f"Layout {layouts[subi[i]]} has no pixel {pixi[i]}")
+        return slot_starts[subi] + pixi
+
+    # builds the pixel dataframe for a device selection
+    # subi and pixi are int arrays of the slot index and layout pixel index of each selected pixel
+    # slots holds per slot arrays: system_label, user_label, layout, position (ns x number of axes) and vars (ns x number of variables)
+    def pixel_table(self, subi, pixi, slots, num_axes, variables):
+        subi = np.asarray(subi, dtype=np.int64)
+        pixi = np.asarray(pixi, dtype=np.int64)
+        n = len(subi)
+        ns = len(slots['layout'])
+
+        # per slot strings are dictionary encoded once per slot then gathered
+        def slot_categorical(values):
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+            return pd.Categorical.from_codes(codes[subi], categories=uniques)
+
+        system_labels = np.asarray(slots['system_label'], dtype=str)
+        user_labels = np.asarray(slots['user_label'], dtype=str)
+        slot_labels = np.where(user_labels == "", system_labels, np.char.add(np.char.add(system_labels, "_"), user_labels))
+        g = self.rows(subi, pixi, slots['layout'])  # rows in the flat geometry arrays
+
+        # the stage movements need to be reversed from the physical location offsets, so all
+        # these offset numbers get multiplied by -1 before getting stored in the output dataframe
+        por = -self.locations[g]
+        sor = -np.asarray(slots['position'], dtype=np.float64).reshape(ns, -1)[subi]
+        k = min(por.shape[1], sor.shape[1])
+        locr = sor[:, :k] + por[:, :k]
+        mux_index = self.pads[g]
+
+        cols = {}
+        cols['system_label'] = slot_categorical(system_labels)  # label for the substrate slot that the system uses
+        cols['user_label'] = slot_categorical(user_labels)  # label the user may have entered for this substrate
+        cols['label'] = slot_categorical(slot_labels)  # combo of the above two, formated as "{system}_{user}"
+        cols['substrate_index'] = subi  # a number used to represent the substrate
+        cols['layout_pixel_index'] = pixi  # pixel index is for which pixel this is on its layout
+        cols['pixel_offset_raw'] = row_views(por)  # offset of this pixel relative to the center of its substrate (as read from the config file)
+        cols['pixel_offset'] = row_views(por[:, :num_axes])  # (with unconfigured axes trimmed)
+        cols['substrate_offset_raw'] = row_views(sor)  # offset of this substrate in the array
+        cols['substrate_offset'] = row_views(sor[:, :num_axes])  # (with unconfigured axes trimmed)
+        cols['loc_raw'] = row_views(locr)  # offset of this pixel from center of substrate array
+        cols['loc'] = row_views(locr[:, :num_axes])  # (with unconfigured axes trimmed)
+        cols['layout'] = slot_categorical(slots['layout'])  # the layout name
+        cols['area'] = self.areas[g]  # illuminated area in cm^2
+        cols['dark_area'] = self.dark_areas[g]  # active area in cm^2
+        cols['mux_index'] = mux_index  # which mux switch needs to be closed for this (same as "pad" in cofig file)
+        cols['mux_string'] = np.char.add(np.char.add("s", system_labels[subi]), mux_index.astype(str)).astype(object)  # the string the firmware needs to select this pixel
+        slot_vars = np.asarray(slots['vars'], dtype=str).reshape(ns, len(variables))
+        user_vars = np.empty(ns, dtype=object)  # dictionary for the user variables
+        for i in range(ns):
+            user_vars[i] = dict(zip(variables, slot_vars[i].tolist()))
+        cols['user_vars'] = user_vars[subi]
+        for j, var in enumerate(variables):  # experimental variable values
+            cols[var] = slot_categorical(slot_vars[:, j])
+        return pd.DataFrame(cols, index=pd.RangeIndex(n))
+
+
+# the number of set bits in every possible byte
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+class DeviceSelection(object):
+    """
+    Which devices are selected in a device store, held as a packed bitmask in bitmask order
+    (bit b lives in byte b//8 at position b%8, so the bytes are the little endian form of the hex mask)
+    plus per slot selection counts, so that a toggle only has to touch the slot it happened in.
+    The hex text of the bitmask is kept up to date incrementally too.
+    """
+
+    hex_chars = np.frombuffer(b'0123456789ABCDEF', dtype=np.uint8)
+
+    def __init__(self, slot_sizes):
+        self.sizes = np.asarray(slot_sizes, dtype=np.int64)  # number of devices on each slot
+        self.starts = np.concatenate([[0], np.cumsum(self.sizes)]).astype(np.int64)  # first bit of each slot
+        self.n_digits = max(1, math.ceil(self.n_bits / 4))
+        self.words = np.zeros(math.ceil(self.n_digits / 2), dtype=np.uint8)  # the packed bits
+        self.counts = np.zeros(len(self.sizes), dtype=np.int64)  # number of selected devices on each slot
+        self.total = 0  # number of selected devices
+        self.digits = bytearray(b'0' * self.n_digits)  # the hex text, most significant digit first
+        self.dirty = set()  # slots changed since the last flush
+
+    @property
+    def n_bits(self):
+        return int(self.starts[-1])
+
+    # one bool per device
+    @property
+    def bits(self):
+        return np.unpackbits(self.words, bitorder='little')[:self.n_bits].astype(bool)
+
+    # the bitmask position(s) of slot/layout pixel index pair(s)
+    def bit_of(self, subi, pixi):
+        return self.starts[subi] + pixi
+
+    # the slot index and layout pixel index of bitmask position(s)
+    def locate(self, b):
+        subi = np.searchsorted(self.starts, b, side='right') - 1
+        return subi, b - self.starts[subi]
+
+    def is_set(self, b):
+        return bool((self.words[b >> 3] >> (b & 7)) & 1)
+
+    def set_device(self, subi, pixi, checked):
+        b = int(self.bit_of(subi, pixi))
+        if self.is_set(b) != checked:
+            if checked:
+                self.words[b >> 3] |= np.uint8(1 << (b & 7))
+            else:
+                self.words[b >> 3] &= np.uint8(~(1 << (b & 7)) & 0xFF)
+            change = 1 if checked else -1
+            self.counts[subi] += change
+            self.total += change
+            self.dirty.add(subi)
+
+    # sets or clears bits a through b-1
+    def _set_range(self, a, b, checked):
+        if b <= a:
+            return
+        first, last = a >> 3, (b - 1) >> 3
+        fill = np.uint8(0xFF if checked else 0)
+        if first == last:
+            edges = [(first, ((1 << (b - a)) - 1) << (a & 7))]
+        else:
+            self.words[first+1:last] = fill
+            edges = [(first, (0xFF << (a & 7)) & 0xFF), (last, 0xFF >> (7 - ((b - 1) & 7)))]
+        for byte, mask in edges:
+            if checked:
+                self.words[byte] |= np.uint8(mask)
+            else:
+                self.words[byte] &= np.uint8(~mask & 0xFF)
+
+    def set_slot(self, subi, checked):
+        self._set_range(self.starts[subi], self.starts[subi+1], checked)
+        new_count = self.sizes[subi] if checked else 0
+        self.total += int(new_count - self.counts[subi])
+        self.counts[subi] = new_count
+        self.dirty.add(subi)
+
+    def set_all(self, checked):
+        self.words[:] = 0
+        self._set_range(0, self.n_bits, checked)
+        self.counts[:] = self.sizes if checked else 0
+        self.total = self.n_bits if checked else 0
+        self.dirty.update(range(len(self.sizes)))
+
+    # replaces the whole selection with one bool per device
+    def set_bits(self, checks):
+        bits = np.zeros(len(self.words) * 8, dtype=bool)
+        bits[:self.n_bits] = checks
+        self.words = np.packbits(bits, bitorder='little')
+        self._recount()
+
+    # replaces the whole selection with a hex bitmask string like the one hex_text() makes
+    # raises ValueError if it's not hex or it selects devices that don't exist
+    def set_hex(self, text):
+        value = int(text.strip(), 16)
+        if value < 0 or (value >> self.n_bits) != 0:
+            raise ValueError(f"Bitmask selects more than the {self.n_bits} devices there are")
+        self.words = np.frombuffer(value.to_bytes(len(self.words), 'little'), dtype=np.uint8).copy()
+        self._recount()
+
+    # per slot counts from the packed bits
+    def _recount(self):
+        csum = np.concatenate([[0], np.cumsum(self.bits, dtype=np.int64)])
+        self.counts = csum[self.starts[1:]] - csum[self.starts[:-1]]
+        self.total = int(csum[-1])
+        self.dirty.update(range(len(self.sizes)))
+
+    # number of selected devices, counted straight from the packed bits
+    def popcount(self):
+        return int(POPCOUNT[self.words].sum())
+
+    # a new selection with the bits of self and other combined with op
+    def _combine(self, other, op):
+        if not np.array_equal(self.sizes, other.sizes):
+            raise ValueError("Can't combine selections made on different slot layouts")
+        result = DeviceSelection(self.sizes)
+        result.words = op(self.words, other.words)
+        result._recount()
+        return result
+
+    def __or__(self, other):
+        return self._combine(other, np.bitwise_or)
+
+    def __and__(self, other):
+        return self._combine(other, np.bitwise_and)
+
+    # the slot index and layout pixel index of every selected device
+    def selected(self):
+        return self.locate(np.flatnonzero(self.bits))
+
+    # rewrites hex digits a through b-1 (counting from the least significant one) from the packed bits
+    def _write_digits(self, a, b):
+        if b > a:
+            j = np.arange(a, b)
+            values = (self.words[j >> 1] >> ((j & 1) * 4).astype(np.uint8)) & 0xF
+            self.digits[self.n_digits - b:self.n_digits - a] = self.hex_chars[values[::-1]].tobytes()
+
+    # brings the hex text up to date for the slots that changed and returns it
+    def hex_text(self):
+        if len(self.dirty) > 64:  # cheaper to redo the lot in one go
+            self._write_digits(0, self.n_digits)
+        else:
+            for subi in self.dirty:
+                self._write_digits(self.starts[subi] // 4, (self.starts[subi+1] + 3) // 4)
+        self.dirty.clear()
+        return "0x" + self.digits.decode()
+
+
+# an object array whose elements are views of the rows of a 2d array
+# so each row still reads like a coordinate list while the data stays in one contiguous block
+def row_views(a):
+    col = np.empty(len(a), dtype=object)
+    for i, row in enumerate(a):
+        col[i] = row
+    return col
+
+
+# the svg space bounding box (x, y, width, height) of the array overview drawing:
+# a unit sized layout background centered on each slot with the slot's label over it,
+# all rotated by angle degrees about the origin
+# centers is (number of slots x 2) and label_widths has the estimated width of each slot's label
+def array_view_box(centers, unit, angle, label_widths, font_size):
+    n = len(centers)
+    if n == 0:
+        return (-unit[0]/2, -unit[1]/2, unit[0], unit[1])
+    half_x = np.column_stack([np.full(n, unit[0]/2), label_widths/2])  # slot box, label box
+    # the label is drawn centered a third of a font size below the slot center, its ink is about 0.7 em tall
+    lo_y = np.array([-unit[1]/2, font_size/3 - 0.35*font_size])
+    hi_y = np.array([unit[1]/2, font_size/3 + 0.35*font_size])
+    xs = np.concatenate([-half_x, half_x, -half_x, half_x], axis=1) + centers[:, [0]]
+    ys = np.concatenate([np.broadcast_to(lo_y, (n, 2)), np.broadcast_to(lo_y, (n, 2)), np.broadcast_to(hi_y, (n, 2)), np.broadcast_to(hi_y, (n, 2))], axis=1) + centers[:, [1]]
+    a = math.radians(angle)
+    rx = xs*math.cos(a) - ys*math.sin(a)
+    ry = xs*math.sin(a) + ys*math.cos(a)
+    x0, y0 = rx.min(), ry.min()
+    return (float(x0), float(y0), float(rx.max() - x0), float(ry.max() - y0))
+
+
+# draws pixels based on layout info from the config file
+# angle is the gui drawing rotation angle used for the rotated version
+def draw_layout(pads, areas, locations, shapes, size, spacing, name, angle):
+    max_render_pix = 300  # how big in pixels should the canvas be on screen?
+    d = len(spacing)
+    canvas = list(spacing)  # a copy, so the del below can't eat the caller's spacing
+    if d == 1:
+        canvas = canvas*2
+    elif d == 3:
+        del(canvas[-1])
+    maxd = max(canvas)
+    scale = max_render_pix/maxd
+
+    d  = draw.Drawing(canvas[0], canvas[1], origin='center', displayInline=False, **{'text-align':'center', 'font-family': 'monospace'})
+    dr = draw.Drawing(canvas[0], canvas[1], origin='center', displayInline=False, **{'text-align':'center', 'font-family': 'monospace'})
+
+    n_pads = len(pads)
+
+    wbg = draw.Rectangle(-canvas[0]/2, -canvas[1]/2, canvas[0], canvas[1], fill='white')
+    d.append(wbg)
+
+    if n_pads > 0:  # handles the empty case
+        bg = draw.Rectangle(-size[0]/2, -size[1]/2, size[0], size[1], fill='black')
+        d.append(bg)
+
+    for i in range(n_pads):
+        pad = pads[i]
+        a = areas[i] * 100  # cm^2 to mm^2
+        xy = locations[i]
+        shape = shapes[i]
+        if shape == 'c':
+            r = math.sqrt(a/math.pi)
+            d.append(draw.Circle(xy[0], xy[1], r, fill='white'))
+        elif shape == 's':
+            rx = math.sqrt(a)
+            d.append(draw.Rectangle(xy[0]-rx/2, xy[1]-rx/2, rx, rx, fill='white'))
+        elif isinstance(shape, float):
+            rx = shape
+            ry = a/rx
+            d.append(draw.Rectangle(xy[0]-rx/2, xy[1]-ry/2, rx, ry, fill='white'))
+        lab_font_size = scale/3
+        lx = xy[0]
+        ly = xy[1]-lab_font_size/3
+        #urot = f"rotate({-angle},{lx},{ly})"
+        lab = draw.Text(str(pad), lab_font_size, lx, ly, fill='gray', **{'text-anchor':'middle','dominant-baseline':'central', 'font-weight':"bold"})  # , "transform":urot
+        d.append(lab)
+    if ('OLD' in name) or ('legacy' in name):
+        ll = maxd/4
+        x1 = draw.Line(ll, ll, -ll, -ll, **{'stroke-width':f"{ll/8}","stroke":"red"})
+        d.append(x1)
+        x2 = draw.Line(ll, -ll, -ll, ll, **{'stroke-width':f"{ll/8}","stroke":"red"})
+        d.append(x2)
+
+    d.setPixelScale(scale)
+
+    # now for the rotated version of this
+    rot = f"rotate({angle},0,0)"
+    g = draw.Group(**{"transform":rot})
+    for e in d.allElements():
+        g.append(e)
+    dr.append(g)
+    dr.setPixelScale(scale)
+
+    return d, dr
+
+
+# builds the array overview drawing: every slot's layout drawing translated to the slot's center
+# with the slot's label on top, all rotated by angle degrees and framed by view_box
+# layout_bodies maps layout names to the contents of their (unrotated) svg drawings, see svg_body()
+# with symbols=True each layout is written once into <defs> and each slot is just a <use> of it plus its label,
+# otherwise every slot gets its own copy of all of its layout's elements
+def compose_array_drawing(labels, layouts, centers, layout_bodies, angle, font_size, view_box, symbols=True):
+    d = draw.Drawing(view_box[2], view_box[3], origin='center', displayInline=False, **{'text-align':'center', 'font-family': 'monospace'})
+    d.viewBox = view_box
+
+    rot = f"rotate({angle},0,0)"
+    rg = draw.Group(**{"transform":rot})
+    label_style = {'fill': 'lime', 'fill_opacity': 0.9, 'text-anchor': 'middle', 'font-weight': "bold"}
+    baseline = {'dominant-baseline': 'central'}  # not reliably inherited, so this stays on each label
+
+    if symbols == True:
+        layout_symbols = {}  # layout name --> group holding that layout's elements, ends up in <defs>
+        slot_labels = draw.Group(**label_style)  # the labels go on top of all the slots and share their style
+        for label, layout, center in zip(labels, layouts, centers):
+            if layout not in layout_symbols:
+                layout_symbols[layout] = draw.Raw(layout_bodies[layout])
+            # drawSvg flips y, center is in svg coordinates
+            rg.append(draw.Use(layout_symbols[layout], center[0], -center[1]))
+            slot_labels.append(draw.Text(label, font_size, center[0], -center[1]-font_size/3, **baseline))
+        rg.append(slot_labels)
+    else:
+        for label, layout, center in zip(labels, layouts, centers):
+            t2 = f"translate({center[0]},{center[1]})"
+            g = draw.Group(**{"transform":t2})
+            g.append(draw.Raw(layout_bodies[layout]))
+            g.append(draw.Text(label, font_size, 0, -font_size/3, **label_style, **baseline))
+            rg.append(g)
+    d.append(rg)
+    return d
+
+
+# everything inside a complete svg document's <svg> element
+def svg_body(svg):
+    start = svg.index('>', svg.index('<svg')) + 1
+    return svg[start:svg.rindex('</svg>')]
+
+
+# renders an svg document at its own size and returns it as png data
+def render_png(svg):
+    handle = Rsvg.Handle.new_from_data(svg.encode())
+    dims = handle.get_dimensions()
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, max(1, dims.width), max(1, dims.height))
+    handle.render_cairo(cairo.Context(surface))
+    buf = BytesIO()
+    surface.write_to_png(buf)
+    return buf.getvalue()
+
+
+class LayoutDrawing(object):
+    """
+    The pictures of one substrate layout, made the first time they're needed.
+    They come from the on-disk cache when a layout with the same config, spacing and angle was drawn before
+    (in this or an earlier run) and are drawn with draw_layout (then saved to the cache) otherwise.
+    """
+
+    version = 1  # bump this when draw_layout's output changes to orphan old cache entries
+
+    def __init__(self, name, layout, spacing, angle, cache_dir=None):
+        self.name = name
+        self.layout = layout
+        self.spacing = list(spacing)
+        self.angle = angle
+        self.cache_dir = cache_dir
+        key_data = {'version': self.version, 'name': name, 'layout': layout, 'spacing': self.spacing, 'angle': angle}
+        self.key = config_digest(key_data)
+        self._straight = None  # the unrotated svg
+        self._rotated = None  # the rotated svg
+        self._png = None  # the rotated svg, rendered
+        self._surface = None  # the png, decoded
+
+    def _files(self):
+        stem = pathlib.Path(self.cache_dir) / self.key
+        return stem.with_suffix('.svg'), stem.with_suffix('.rotated.svg'), stem.with_suffix('.rotated.png')
+
+    def _make(self):
+        if self._rotated is not None:
+            return
+        if self.cache_dir is not None:
+            try:
+                straight, rotated, png = self._files()
+                self._straight = straight.read_text()
+                self._rotated = rotated.read_text()
+                self._png = png.read_bytes()
+                lg.debug(f"Layout drawing cache hit: {self.name}")
+                return
+            except OSError:
+                pass
+        val = self.layout
+        d, dr = draw_layout(val['pads'], val['areas'], val['locations'], val['shapes'], val['size'], self.spacing, self.name, self.angle)
+        self._straight = d.asSvg()
+        self._rotated = dr.asSvg()
+        self._png = render_png(self._rotated)
+        if self.cache_dir is not None:
+            try:
+                pathlib.Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+                for path, data in zip(self._files(), [self._straight.encode(), self._rotated.encode(), self._png]):
+                    tmp = path.with_name(path.name + '.part')
+                    tmp.write_bytes(data)
+                    os.replace(tmp, path)  # so a crash can't leave a half written entry behind
+            except OSError as e:
+                lg.debug(f"Could not cache layout drawing {self.name}: {e}")
+
+    # the contents of the unrotated drawing, for composing the array overview
+    @property
+    def body(self):
+        self._make()
+        return svg_body(self._straight)
+
+    # the rotated drawing as a complete svg document
+    @property
+    def svg(self):
+        self._make()
+        return self._rotated
+
+    # the rotated drawing as a cairo surface
+    @property
+    def surface(self):
+        if self._surface is None:
+            self._make()
+            self._surface = cairo.ImageSurface.create_from_png(BytesIO(self._png))
+        return self._surface
+
+
+class UniformGrid(object):
+    """
+    Spatial index of axis aligned boxes on a uniform grid of square cells about the size of a typical box.
+    Each box is listed in every cell it overlaps, so the boxes that might contain a point
+    are found with one cell lookup no matter how many boxes there are.
+    """
+
+    max_cells = 4*2**20
+
+    def __init__(self, x0, y0, x1, y1):
+        n = len(x0)
+        if n == 0:
+            x0 = y0 = x1 = y1 = np.zeros(1)
+        self.cell = max(float(np.median(np.maximum(x1 - x0, y1 - y0))), 1e-9)
+        self.origin = (float(x0.min()), float(y0.min()))
+        span = (float(x1.max()) - self.origin[0], float(y1.max()) - self.origin[1])
+        while (math.floor(span[0]/self.cell) + 1)*(math.floor(span[1]/self.cell) + 1) > self.max_cells:
+            self.cell *= 2
+        self.shape = (math.floor(span[0]/self.cell) + 1, math.floor(span[1]/self.cell) + 1)  # cells in x, y
+        if n == 0:
+            self.items = np.zeros(0, dtype=np.int64)
+            self.starts = np.zeros(self.shape[0]*self.shape[1] + 1, dtype=np.int64)
+            return
+        cx0, cy0 = self.cells_of(x0, y0)
+        cx1, cy1 = self.cells_of(x1, y1)
+        nx = cx1 - cx0 + 1
+        counts = nx*(cy1 - cy0 + 1)
+        ids = np.repeat(np.arange(n), counts)
+        offs = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_ids = (np.repeat(cy0, counts) + offs // np.repeat(nx, counts))*self.shape[0] + np.repeat(cx0, counts) + offs % np.repeat(nx, counts)
+        order = np.argsort(cell_ids, kind='stable')
+        self.items = ids[order]  # box ids, grouped by cell
+        self.starts = np.searchsorted(cell_ids[order], np.arange(self.shape[0]*self.shape[1] + 1))  # where each cell's group starts
+
+    # the (clipped) cell indices of points
+    def cells_of(self, x, y):
+        cx = np.clip(np.floor((np.asarray(x) - self.origin[0])/self.cell).astype(np.int64), 0, self.shape[0] - 1)
+        cy = np.clip(np.floor((np.asarray(y) - self.origin[1])/self.cell).astype(np.int64), 0, self.shape[1] - 1)
+        return cx, cy
+
+    # ids of the boxes that might contain the point x, y
+    def at(self, x, y):
+        cx, cy = self.cells_of(x, y)
+        c = int(cy*self.shape[0] + cx)
+        return self.items[self.starts[c]:self.starts[c+1]]
+
+    # ids of the boxes that might overlap the box from xa, ya to xb, yb
+    def in_box(self, xa, ya, xb, yb):
+        cxa, cya = self.cells_of(xa, ya)
+        cxb, cyb = self.cells_of(xb, yb)
+        found = [self.items[self.starts[cy*self.shape[0] + cxa]:self.starts[cy*self.shape[0] + cxb + 1]] for cy in range(int(cya), int(cyb) + 1)]
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+
+# which of the points x, y are inside a polygon (m x 2 vertices), by counting edge crossings
+def points_in_polygon(x, y, polygon):
+    inside = np.zeros(len(x), dtype=bool)
+    px, py = polygon[:, 0], polygon[:, 1]
+    qx, qy = np.roll(px, 1), np.roll(py, 1)
+    for ax, ay, bx, by in zip(px, py, qx, qy):
+        if ay == by:
+            continue
+        crosses = ((ay > y) != (by > y)) & (x < (bx - ax)*(y - ay)/(by - ay) + ax)
+        inside ^= crosses
+    return inside
+
+
+class ArrayIndex(object):
+    """
+    Hit testing for the array overview, in slot coordinates (rotate screen points with ArrayView.screen_to_slot first).
+    Every slot's box and every pixel's light mask opening go into UniformGrids so clicks are found
+    without looking at the whole array.
+    """
+
+    def __init__(self, centers, unit, layouts, geometry, labels=()):
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.unit = list(unit)
+        self.slot_grid = UniformGrid(self.centers[:, 0] - unit[0]/2, self.centers[:, 1] - unit[1]/2, self.centers[:, 0] + unit[0]/2, self.centers[:, 1] + unit[1]/2)
+
+        # flatten out every pixel in the array
+        n_pix = np.array([geometry.sizes.get(layout, 0) for layout in layouts], dtype=np.int64)
+        self.subi = np.repeat(np.arange(len(layouts)), n_pix)
+        self.pixi = np.arange(n_pix.sum()) - np.repeat(np.cumsum(n_pix) - n_pix, n_pix)
+        g = geometry.rows(self.subi, self.pixi, layouts)
+        loc = geometry.locations[g]
+        # layout locations are y up, the drawing is y down
+        self.x = self.centers[self.subi, 0] + loc[:, 0]
+        self.y = self.centers[self.subi, 1] - (loc[:, 1] if loc.shape[1] > 1 else 0)
+        self.half_sizes = geometry.half_sizes[g]
+        self.round = geometry.round[g]
+        self.pads = geometry.pads[g]
+        self.ids = {}  # (slot label, pad number) --> pixel index
+        if len(labels) == len(layouts):
+            self.ids = dict(zip(zip(np.asarray(labels, dtype=object)[self.subi].tolist(), self.pads.tolist()), range(len(g))))
+        hw, hh = self.half_sizes[:, 0], self.half_sizes[:, 1]
+        self.pixel_grid = UniformGrid(self.x - hw, self.y - hh, self.x + hw, self.y + hh)
+
+    # (slot index, layout pixel index) of the pixel at x, y
+    # (slot index, None) if it's on a slot but not a pixel, None if it's on nothing
+    def hit(self, x, y, pixels=True):
+        if pixels == True:
+            c = self.pixel_grid.at(x, y)
+            dx = np.abs(self.x[c] - x)
+            dy = np.abs(self.y[c] - y)
+            hw, hh = self.half_sizes[c, 0], self.half_sizes[c, 1]
+            inside = np.where(self.round[c], dx**2 + dy**2 <= hw**2, (dx <= hw) & (dy <= hh))
+            if np.any(inside):
+                i = c[np.flatnonzero(inside)[0]]
+                return int(self.subi[i]), int(self.pixi[i])
+        c = self.slot_grid.at(x, y)
+        inside = (np.abs(self.centers[c, 0] - x) <= self.unit[0]/2) & (np.abs(self.centers[c, 1] - y) <= self.unit[1]/2)
+        if np.any(inside):
+            return int(c[np.flatnonzero(inside)[0]]), None
+        return None
+
+    # (slot indices, layout pixel indices) of the pixels centered inside a polygon (m x 2)
+    def lasso(self, polygon):
+        lo = polygon.min(axis=0)
+        hi = polygon.max(axis=0)
+        c = self.pixel_grid.in_box(lo[0], lo[1], hi[0], hi[1])
+        c = c[points_in_polygon(self.x[c], self.y[c], polygon)]
+        return self.subi[c], self.pixi[c]
+
+
+class PixelOverlay(object):
+    """
+    Live status of individual pixels for the array overview.
+    update() can be called from any thread, updates pile up until take() applies them (from the gtk thread, at most once a frame).
+    Pixels are colored by their state if they have one, otherwise by their value on a color scale
+    that stretches to cover all the values seen since the last clear().
+    """
+
+    states = {
+        'queued': (0.6, 0.6, 0.6, 0.7),
+        'running': (0.2, 0.5, 1.0, 0.8),
+        'done': (0.2, 0.8, 0.2, 0.8),
+        'failed': (0.9, 0.1, 0.1, 0.8),
+        'pass': (0.2, 0.8, 0.2, 0.8),
+        'fail': (0.9, 0.1, 0.1, 0.8),
+    }
+    other_state = (0.8, 0.2, 0.8, 0.8)  # for states not listed above
+    value_stops = np.array([[0.27, 0.0, 0.33], [0.13, 0.57, 0.55], [0.99, 0.91, 0.14]])  # low, middle and high value colors
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}  # (slot label, pad number) --> (state, value) updates not yet applied
+        self.status = {}  # (slot label, pad number) --> (state, value)
+        self.cleared = False  # was there a clear() since the last take()
+        self.lo = math.inf  # value range
+        self.hi = -math.inf
+        self.index = None
+        self.colors = np.zeros((0, 4))  # rgba for every pixel in index, alpha 0 means no status
+
+    # records a pixel's new state or value, returns True if the caller should schedule a take()
+    # raises ValueError or TypeError for a value that isn't a finite number
+    def update(self, slot, pad, state=None, value=None):
+        if value is not None:
+            value = float(value)
+            if not math.isfinite(value):
+                raise ValueError(f"Pixel value {value} is not finite")
+        with self.lock:
+            first = (len(self.pending) == 0) and (self.cleared == False)
+            old_state, old_value = self.pending.get((slot, pad), (None, None))
+            self.pending[(slot, pad)] = (old_state if state is None else state, old_value if value is None else value)
+        return first
+
+    # forgets every pixel's status, returns True if the caller should schedule a take()
+    def clear(self):
+        with self.lock:
+            first = (len(self.pending) == 0) and (self.cleared == False)
+            self.pending = {}
+            self.cleared = True
+        return first
+
+    # the pixels to color from now on
+    def bind(self, index):
+        self.index = index
+        self.colors = np.zeros((len(index.x), 4))
+        for key in self.status:
+            self._color(key)
+
+    def _color(self, key):
+        i = self.index.ids.get(key)
+        if i is not None:
+            state, value = self.status.get(key, (None, None))
+            if state is not None:
+                self.colors[i] = self.states.get(state, self.other_state)
+            elif value is not None:
+                t = 0.5 if self.hi <= self.lo else (value - self.lo)/(self.hi - self.lo)
+                t = min(max(t, 0), 1)*2
+                k = min(int(t), 1)
+                self.colors[i, :3] = self.value_stops[k] + (self.value_stops[k+1] - self.value_stops[k])*(t - k)
+                self.colors[i, 3] = 0.85
+            else:
+                self.colors[i] = 0
+        return i
+
+    # applies the pending updates, returns the indices of the pixels whose color changed or None if they all might have
+    def take(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            cleared, self.cleared = self.cleared, False
+        if cleared:
+            self.status = {}
+            self.lo, self.hi = math.inf, -math.inf
+        rescaled = False
+        for key, (state, value) in pending.items():
+            self.status[key] = (state, value)
+            if (state is None) and (value is not None) and ((value < self.lo) or (value > self.hi)):
+                self.lo, self.hi = min(self.lo, value), max(self.hi, value)
+                rescaled = True
+        if self.index is None:
+            return []
+        if cleared or rescaled:
+            self.bind(self.index)
+            return None
+        changed = [self._color(key) for key in pending]
+        return [i for i in changed if i is not None]
+
+
+class ArrayView(object):
+    """
+    Zoom, pan and level of detail for the array overview.
+    Positions come in three flavors: slot coordinates (what the slot centers are given in),
+    svg coordinates (slot coordinates rotated by angle about the origin, what view_box is in)
+    and screen coordinates (svg coordinates scaled by zoom and shifted so view_box's corner lands on pan).
+    Zoomed out the slots are drawn as plain boxes colored by their selection state,
+    zoomed in the full svg drawing is shown in tile_size square tiles that get cached for each zoom level.
+    """
+
+    tile_size = 256  # screen pixels
+    detail_px = 150  # slots at least this big on screen get drawn in full detail
+    min_level = -4  # zoom levels are powers of sqrt(2) relative to the zoom that fits the whole array
+    max_level = 16
+
+    def __init__(self, centers, unit, angle, labels, view_box):
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.unit = list(unit)
+        self.angle = angle
+        self.labels = list(labels)
+        self.view_box = view_box
+        self.level = 0
+        self.fit_zoom = 1.0
+        self.pan = (0, 0)
+        self.size = None  # widget size the view was last fitted to
+        self.scroll_accum = 0.0  # smooth scrolling that hasn't added up to a whole zoom step yet
+
+    @property
+    def zoom(self):
+        return self.fit_zoom * 2**(self.level/2)
+
+    # scales the whole array to fit in a width x height area and centers it there
+    def fit(self, width, height):
+        self.size = (width, height)
+        self.level = 0
+        self.fit_zoom = min(width/self.view_box[2], height/self.view_box[3])*0.95
+        self.pan = (round((width - self.view_box[2]*self.fit_zoom)/2), round((height - self.view_box[3]*self.fit_zoom)/2))
+
+    # changes zoom level by steps, keeping the svg point under screen position (x, y) in place
+    def zoom_at(self, steps, x, y):
+        wx, wy = self.screen_to_svg(x, y)
+        self.level = min(max(self.level + steps, self.min_level), self.max_level)
+        z = self.zoom
+        self.pan = (round(x - (wx - self.view_box[0])*z), round(y - (wy - self.view_box[1])*z))
+
+    def pan_by(self, dx, dy):
+        self.pan = (self.pan[0] + round(dx), self.pan[1] + round(dy))
+
+    def screen_to_svg(self, x, y):
+        z = self.zoom
+        return (x - self.pan[0])/z + self.view_box[0], (y - self.pan[1])/z + self.view_box[1]
+
+    # the screen coordinates of points in slot coordinates
+    def slot_to_screen(self, x, y):
+        a = math.radians(self.angle)
+        sx = x*math.cos(a) - y*math.sin(a)
+        sy = x*math.sin(a) + y*math.cos(a)
+        z = self.zoom
+        return (sx - self.view_box[0])*z + self.pan[0], (sy - self.view_box[1])*z + self.pan[1]
+
+    # undoes the rotation too
+    def screen_to_slot(self, x, y):
+        sx, sy = self.screen_to_svg(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        a = math.radians(self.angle)
+        return sx*math.cos(a) + sy*math.sin(a), -sx*math.sin(a) + sy*math.cos(a)
+
+    # the cairo matrix that takes slot coordinates to screen coordinates
+    def slot_matrix(self):
+        z = self.zoom
+        m = cairo.Matrix(xx=z, yy=z, x0=self.pan[0] - self.view_box[0]*z, y0=self.pan[1] - self.view_box[1]*z)
+        return cairo.Matrix.init_rotate(math.radians(self.angle)).multiply(m)
+
+    # the slot coordinate bounding box (lo, hi) of the area a cairo context will draw in
+    def clip_slot_box(self, cairo_context):
+        x0, y0, x1, y1 = cairo_context.clip_extents()
+        x, y = self.screen_to_slot([x0, x1, x0, x1], [y0, y0, y1, y1])
+        return np.array([x.min(), y.min()]), np.array([x.max(), y.max()])
+
+    # draws the pixels that have an overlay color over whatever's there
+    def draw_overlay(self, cairo_context, index, colors):
+        cr = cairo_context
+        lo, hi = self.clip_slot_box(cr)
+        ids = index.pixel_grid.in_box(lo[0], lo[1], hi[0], hi[1])
+        ids = ids[colors[ids, 3] > 0]
+        if len(ids) == 0:
+            return
+        cr.save()
+        cr.transform(self.slot_matrix())
+        for i in ids:
+            hw, hh = index.half_sizes[i]
+            if index.round[i]:
+                cr.arc(index.x[i], index.y[i], hw, 0, 2*math.pi)
+            else:
+                cr.rectangle(index.x[i] - hw, index.y[i] - hh, 2*hw, 2*hh)
+            cr.set_source_rgba(*colors[i])
+            cr.fill()
+        cr.restore()
+
+    # screen area (x, y, width, height) that covers pixel i of an ArrayIndex
+    def pixel_screen_box(self, index, i):
+        hw, hh = index.half_sizes[i]
+        x, y = self.slot_to_screen(index.x[i] + np.array([-hw, hw, -hw, hw]), index.y[i] + np.array([-hh, -hh, hh, hh]))
+        x0, y0 = math.floor(x.min()) - 1, math.floor(y.min()) - 1
+        return x0, y0, math.ceil(x.max()) + 1 - x0, math.ceil(y.max()) + 1 - y0
+
+    # big enough on screen for the pad geometry to be worth drawing?
+    def detailed(self):
+        return min(self.unit)*self.zoom >= self.detail_px
+
+    # (tx, ty, x, y) for each tile that covers part of a width x height area, x, y being where it goes on screen
+    def visible_tiles(self, width, height):
+        t = self.tile_size
+        px, py = self.pan
+        z = self.zoom
+        # no need to go past the edges of the drawing
+        x_end = min(width, px + self.view_box[2]*z)
+        y_end = min(height, py + self.view_box[3]*z)
+        tiles = []
+        for ty in range(max(0, math.floor(-py/t)), math.ceil((y_end - py)/t)):
+            for tx in range(max(0, math.floor(-px/t)), math.ceil((x_end - px)/t)):
+                tiles.append((tx, ty, px + tx*t, py + ty*t))
+        return tiles
+
+    # draws tile (tx, ty) of an Rsvg handle of the array drawing (made with a pixel scale of 1) at the current zoom
+    def render_tile(self, cairo_context, handle, tx, ty):
+        cairo_context.translate(-tx*self.tile_size, -ty*self.tile_size)
+        cairo_context.scale(self.zoom, self.zoom)
+        handle.render_cairo(cairo_context)
+
+    # the low detail version: one box per slot in the color fills gives for it (n x 4 rgba),
+    # outlined in the color outlines gives for it (or not if its alpha is 0), with labels once they'd be legible
+    def draw_simple(self, cairo_context, fills, outlines):
+        cr = cairo_context
+        cr.set_source_rgb(1, 1, 1)
+        cr.paint()
+        lo, hi = self.clip_slot_box(cr)
+        cr.save()
+        cr.transform(self.slot_matrix())
+        ux, uy = self.unit[0]*0.9, self.unit[1]*0.9  # leave a gap between the slots
+        # skip slots that are outside the area being redrawn
+        lo = lo - max(self.unit)
+        hi = hi + max(self.unit)
+        visible = np.flatnonzero(np.all((self.centers >= lo) & (self.centers <= hi), axis=1))
+        for i in visible:
+            x, y = self.centers[i]
+            cr.rectangle(x - ux/2, y - uy/2, ux, uy)
+            cr.set_source_rgba(*fills[i])
+            if outlines[i][3] > 0:
+                cr.fill_preserve()
+                cr.set_source_rgba(*outlines[i])
+                cr.set_line_width(min(self.unit)*0.06)
+                cr.stroke()
+            else:
+                cr.fill()
+        font_size = min(self.unit)*0.3
+        if font_size*self.zoom >= 8:
+            cr.select_font_face("monospace", cairo.FONT_SLANT_NORMAL, cairo.FONT_WEIGHT_BOLD)
+            cr.set_font_size(font_size)
+            cr.set_source_rgb(0, 0, 0)
+            for i in visible:
+                x, y = self.centers[i]
+                ext = cr.text_extents(self.labels[i])
+                cr.move_to(x - ext.width/2 - ext.x_bearing, y - ext.height/2 - ext.y_bearing)
+                cr.show_text(self.labels[i])
+        cr.restore()
+
+
+class SurfaceCache(object):
+    """
+    Rendered svg drawings kept as cairo image surfaces, so draw handlers only have to paint a surface.
+    Entries are keyed by (drawing name, width, height, scale factor) and the least recently used
+    ones are dropped once the surfaces take more than budget bytes.
+    """
+
+    def __init__(self, budget=64*2**20):
+        self.budget = budget
+        self.entries = collections.OrderedDict()  # key --> surface, least recently used first
+        self.used = 0  # bytes held by the surfaces
+        self.hits = 0
+        self.misses = 0
+
+    # the surface for an Rsvg handle rendered at its own size, rendering it if it's not cached
+    def get(self, name, handle, scale=1):
+        dims = handle.get_dimensions()
+        return self.fetch((name, dims.width, dims.height, scale), dims.width, dims.height, scale, handle.render_cairo)
+
+    # the surface for key, if it's not cached, a width x height one gets made and render(cairo_context) draws it
+    # key[0] is the name of the drawing this is a rendering of
+    def fetch(self, key, width, height, scale, render):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, max(1, math.ceil(width*scale)), max(1, math.ceil(height*scale)))
+        surface.set_device_scale(scale, scale)
+        render(cairo.Context(surface))
+        surface.flush()
+        self.entries[key] = surface
+        self.used += surface.get_stride()*surface.get_height()
+        self.evict()
+        return surface
+
+    # drop least recently used surfaces until we're under budget (the newest one always stays)
+    def evict(self):
+        while (self.used > self.budget) and (len(self.entries) > 1):
+            key, surface = self.entries.popitem(last=False)
+            self.used -= surface.get_stride()*surface.get_height()
+
+    # forget every rendering of a drawing, for when it changes
+    def invalidate(self, name):
+        for key in [key for key in self.entries if key[0] == name]:
+            surface = self.entries.pop(key)
+            self.used -= surface.get_stride()*surface.get_height()
+
+
+# use some variables from the config file to generate
+# arrays of labels and positions for each substrate slot in the setup
+# returns a label array shaped like counts and a float position array shaped like counts + [number of axes]
+def make_meshgrids(counts, spacings, polarities, lab_flips):
+    d = len(counts)  # number of dimensions
+    # the labeling start character is kinda wonky so we can handle it here based on d
+    if d == 1:
+        label_starts = ['A']
+    elif d == 2:
+        label_starts = ['1','A']
+    else:
+        label_starts = ['a','1','A']
+    ranges = [np.arange(x) for x in counts]
+    location_ranges = [r*spacings[i] for i,r in enumerate(ranges)]
+    # center the location ranges on zero and flip them if the axis polarity value is 1
+    location_ranges = [(r-r.max()/2)*(-2*polarities[i]+1) for i,r in enumerate(location_ranges)]
+    pos_meshgrid = np.stack(np.meshgrid(*location_ranges, indexing='ij'), axis=-1).astype(np.float64)
+
+    # each label is one character per axis, so the code points of all the labels
+    # can be laid out in one go and viewed as a fixed width string array
+    codes = np.stack([idx + ord(label_starts[j]) for j, idx in enumerate(np.indices(counts))], axis=-1)
+    label_meshgrid = np.ascontiguousarray(codes, dtype=np.uint32).view(f'U{d}')[..., 0]
+
+    # flip the labels if the config file says so
+    for i, t in enumerate(lab_flips):
+        if t == True:
+            label_meshgrid = np.flip(label_meshgrid, i)
+
+    return label_meshgrid, pos_meshgrid
+
+
+class SlotLocations(object):
+    """
+    Position of every substrate slot, looked up by slot label.
+    The positions live in one (number of slots x number of axes) float array and
+    a dict maps each label to its row, so whole columns of labels can be looked up at once.
+    """
+
+    def __init__(self, label_grid, position_grid):
+        self.labels = label_grid.ravel()
+        self.positions = position_grid.reshape(len(self.labels), -1)
+        self.row_of = {label: row for row, label in enumerate(self.labels.tolist())}  # label --> row in self.positions
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, label):
+        return label in self.row_of
+
+    # the rows in self.positions for an array of labels
+    def rows(self, labels):
+        if isinstance(labels, np.ndarray):
+            labels = labels.tolist()  # plain strs are much quicker to look up than numpy ones
+        try:
+            return np.fromiter(map(self.row_of.__getitem__, labels), dtype=np.intp, count=len(labels))
+        except KeyError as e:
+            raise KeyError(f"Unknown slot label: {e.args[0]}") from None
+
+    # positions for an array of labels
+    def take(self, labels):
+        return self.positions.take(self.rows(labels), axis=0)
+
+    def __getitem__(self, label):
+        return self.positions[self.row_of[label]]
+
+
+# reduces a trace to the first and last extreme of each of n_bins runs of samples
+# so that peaks narrower than a bin still show up when it's drawn n_bins wide
+# returns the kept samples, in their original order
+def decimate_minmax(x, y, n_bins):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2*n_bins:
+        return x, y
+    starts = np.linspace(0, n, n_bins + 1).astype(int)[:-1]
+    bins = np.repeat(np.arange(n_bins), np.diff(np.append(starts, n)))
+    i = np.arange(n)
+    i_min = np.minimum.reduceat(np.where(y == np.minimum.reduceat(y, starts)[bins], i, n), starts)
+    i_max = np.minimum.reduceat(np.where(y == np.maximum.reduceat(y, starts)[bins], i, n), starts)
+    keep = np.stack([np.minimum(i_min, i_max), np.maximum(i_min, i_max)], axis=1).ravel()
+    return x[keep], y[keep]
+
+
+# about n evenly spaced round numbers (1, 2 or 5 times a power of ten apart) covering lo to hi
+def nice_ticks(lo, hi, n=6):
+    if not (hi > lo):
+        lo, hi = lo - 0.5, hi + 0.5
+    raw = (hi - lo)/n
+    mag = 10**math.floor(math.log10(raw))
+    step = next(f*mag for f in (1, 2, 5, 10) if f*mag >= raw)
+    return np.arange(math.ceil(lo/step), math.floor(hi/step) + 1)*step
+
+
+class CalibrationHistory(object):
+    """
+    Append-only store of the calibration data the backend sends, one series per kind (e.g. "spectrum").
+    Each series is a file of float64 arrays (<kind>.dat) and a file of fixed size index records (<kind>.idx)
+    saying when each array came in and where it is. Both are read through memory maps,
+    so looking things up only touches the records that are used, never the whole history.
+    """
+
+    record = np.dtype([('timestamp', '<f8'), ('offset', '<i8'), ('rows', '<i8'), ('cols', '<i8')])
+
+    def __init__(self, root):
+        self.root = pathlib.Path(root)
+        self.lock = threading.Lock()  # appends come from the MQTT thread
+        self.indexes = {}  # kind --> (index file size, memory mapped index)
+
+    # the series name for a calibration topic
+    @staticmethod
+    def kind(topic):
+        return topic.split('/', 1)[-1].replace('/', '_')
+
+    # stores a message's data, which should be numeric (anything else gets stored as an empty array)
+    def append(self, kind, timestamp, data):
+        a = np.zeros((0, 0), dtype='<f8')
+        if data is not None:
+            try:
+                a = np.asarray(data, dtype='<f8')
+                a = a.reshape(a.shape[0] if a.ndim else 1, -1)
+            except (TypeError, ValueError):
+                a = np.zeros((0, 0), dtype='<f8')
+        try:
+            with self.lock:
+                self.root.mkdir(parents=True, exist_ok=True)
+                # data first, so the index never points past the end of it
+                with open(self.root / f"{kind}.dat", "ab") as f:
+                    offset = f.tell()
+                    f.write(a.tobytes())
+                rec = np.array([(timestamp, offset, a.shape[0], a.shape[1])], dtype=self.record)
+                with open(self.root / f"{kind}.idx", "ab") as f:
+                    f.write(rec.tobytes())
+        except OSError as e:
+            lg.debug(f"Could not store {kind} calibration: {e}")
+
+    # the memory mapped index for a series, remapped when it has grown
+    def index(self, kind):
+        path = self.root / f"{kind}.idx"
+        try:
+            size = path.stat().st_size // self.record.itemsize * self.record.itemsize
+        except OSError:
+            size = 0
+        if size == 0:
+            return np.zeros(0, dtype=self.record)
+        cached = self.indexes.get(kind)
+        if (cached is None) or (cached[0] != size):
+            cached = (size, np.memmap(path, dtype=self.record, mode='r', shape=(size // self.record.itemsize,)))
+            self.indexes[kind] = cached
+        return cached[1]
+
+    # the array for one index record (memory mapped, so it's only read if it's used)
+    def array(self, kind, rec):
+        if rec['rows']*rec['cols'] == 0:
+            return np.zeros((rec['rows'], rec['cols']))
+        return np.memmap(self.root / f"{kind}.dat", dtype='<f8', mode='r', offset=int(rec['offset']), shape=(int(rec['rows']), int(rec['cols'])))
+
+    # the newest (timestamp, array) for a series or None if there isn't one
+    def latest(self, kind):
+        idx = self.index(kind)
+        if len(idx) == 0:
+            return None
+        return float(idx[-1]['timestamp']), self.array(kind, idx[-1])
+
+    # up to n (timestamp, array) entries that came in before a time, oldest first
+    def before(self, kind, timestamp, n):
+        idx = self.index(kind)
+        stop = np.searchsorted(idx['timestamp'], timestamp, side='left')
+        return [(float(rec['timestamp']), self.array(kind, rec)) for rec in idx[max(stop - n, 0):stop]]
+
+
+class LatestFrame(object):
+    """
+    Hands the newest of a stream of frames from one thread to another.
+    A frame that arrives before the last one was taken replaces it, so a slow consumer
+    never falls behind, it just skips frames.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame = None
+        self.received = 0
+        self.dropped = 0  # frames replaced before anyone took them
+
+    # offer a new frame
+    def put(self, frame):
+        with self.lock:
+            self.received += 1
+            if self.frame is not None:
+                self.dropped += 1
+            self.frame = frame
+
+    # the newest frame (or None if there's been nothing new since the last take)
+    def take(self):
+        with self.lock:
+            frame = self.frame
+            self.frame = None
+        return frame
+
+
+class LinePlot(object):
+    """
+    A line plot drawn straight onto a cairo context.
+    Subclasses provide the lines (already decimated to the plot's pixel width) and the axis limits.
+    """
+
+    margins = (70, 15, 15, 45)  # left, right, top, bottom in pixels
+    font_size = 12
+
+    def __init__(self, xlabel, ylabel):
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.limits = (0.0, 1.0, 0.0, 1.0)  # x min, x max, y min, y max
+
+    # finite points of a trace as float arrays
+    @staticmethod
+    def clean(x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        good = np.isfinite(x) & np.isfinite(y)
+        return x[good], y[good]
+
+    # sets the axis limits to fit a list of (x, y) traces
+    def fit_limits(self, traces):
+        traces = [t for t in traces if len(t[0]) > 0]
+        if len(traces) > 0:
+            self.limits = (min(x.min() for x, y in traces), max(x.max() for x, y in traces), min(y.min() for x, y in traces), max(y.max() for x, y in traces))
+
+    # (x, y, rgba, line width) of each line to draw, back to front, for a plot area this many pixels wide
+    def lines(self, width):
+        return []
+
+    # draws the whole plot into a width x height area of cairo_context
+    def draw(self, cairo_context, width, height):
+        cr = cairo_context
+        left, right, top, bottom = self.margins
+        pw = max(width - left - right, 1)
+        ph = max(height - top - bottom, 1)
+        lines = self.lines(pw)
+        # x spans the data, y gets some headroom
+        x0, x1, y0, y1 = self.limits
+        if not (x1 > x0):
+            x0, x1 = x0 - 0.5, x0 + 0.5
+        if not (y1 > y0):
+            y0, y1 = y0 - 0.5, y0 + 0.5
+        y0, y1 = y0 - 0.05*(y1 - y0), y1 + 0.05*(y1 - y0)
+        xt = nice_ticks(x0, x1)
+        yt = nice_ticks(y0, y1)
+        sx = pw/(x1 - x0)
+        sy = ph/(y1 - y0)
+
+        cr.set_source_rgb(1, 1, 1)
+        cr.paint()
+        cr.select_font_face("Sans")
+        cr.set_font_size(self.font_size)
+
+        # grid and tick labels
+        cr.set_line_width(1)
+        for t in xt:
+            px = round(left + (t - x0)*sx) + 0.5
+            cr.set_source_rgb(0.85, 0.85, 0.85)
+            cr.move_to(px, top)
+            cr.line_to(px, top + ph)
+            cr.stroke()
+            text = f"{t:g}"
+            ext = cr.text_extents(text)
+            cr.set_source_rgb(0, 0, 0)
+            cr.move_to(px - ext.x_advance/2, top + ph + 5 + self.font_size)
+            cr.show_text(text)
+        for t in yt:
+            py = round(top + ph - (t - y0)*sy) + 0.5
+            cr.set_source_rgb(0.85, 0.85, 0.85)
+            cr.move_to(left, py)
+            cr.line_to(left + pw, py)
+            cr.stroke()
+            text = f"{t:g}"
+            ext = cr.text_extents(text)
+            cr.set_source_rgb(0, 0, 0)
+            cr.move_to(left - 5 - ext.x_advance, py + self.font_size/3)
+            cr.show_text(text)
+
+        # axis labels
+        ext = cr.text_extents(self.xlabel)
+        cr.move_to(left + (pw - ext.x_advance)/2, height - 5)
+        cr.show_text(self.xlabel)
+        ext = cr.text_extents(self.ylabel)
+        cr.save()
+        cr.move_to(self.font_size + 3, top + (ph + ext.x_advance)/2)
+        cr.rotate(-math.pi/2)
+        cr.show_text(self.ylabel)
+        cr.restore()
+
+        # the data, clipped to the plot area
+        cr.save()
+        cr.rectangle(left, top, pw, ph)
+        cr.clip()
+        cr.set_line_join(cairo.LINE_JOIN_ROUND)
+        for x, y, rgba, line_width in lines:
+            if len(x) > 1:
+                px = left + (x - x0)*sx
+                py = top + ph - (y - y0)*sy
+                cr.move_to(px[0], py[0])
+                for i in range(1, len(px)):
+                    cr.line_to(px[i], py[i])
+                cr.set_source_rgba(*rgba)
+                cr.set_line_width(line_width)
+                cr.stroke()
+        cr.restore()
+
+        # frame
+        cr.set_source_rgb(0, 0, 0)
+        cr.rectangle(left + 0.5, top + 0.5, pw - 1, ph - 1)
+        cr.stroke()
+
+
+class SpectrumPlot(LinePlot):
+    """
+    A spectrum, optionally drawn over some older ones.
+    The data gets decimated to the plot's pixel width once per size change,
+    so redraws cost the same however dense the spectrum is.
+    """
+
+    def __init__(self, xlabel='Wavelength [nm]', ylabel='Counts'):
+        super().__init__(xlabel, ylabel)
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.background = []  # (x, y) of older spectra drawn faintly behind, oldest first
+        self.decimated = None  # (plot width, background traces, x, y) as last drawn
+
+    # replaces the plotted data
+    def set_data(self, x, y):
+        self.x, self.y = self.clean(x, y)
+        self.update_limits()
+
+    # replaces the older spectra shown behind the data
+    # they're kept pre-decimated, so they don't hold on to whatever arrays they came from
+    def set_background(self, traces):
+        self.background = [tuple(np.array(a) for a in decimate_minmax(*self.clean(x, y), 2048)) for x, y in traces]
+        self.update_limits()
+
+    # axis limits that fit all the traces
+    def update_limits(self):
+        self.fit_limits(self.background + [(self.x, self.y)])
+        self.decimated = None
+
+    # the trace reduced to what can be seen at a plot width
+    def trace(self, width):
+        if (self.decimated is None) or (self.decimated[0] != width):
+            background = [decimate_minmax(x, y, max(width, 1)) for x, y in self.background]
+            self.decimated = (width, background, *decimate_minmax(self.x, self.y, max(width, 1)))
+        return self.decimated[2:]
+
+    # older spectra fainter the older they are, then the data
+    def lines(self, width):
+        x, y = self.trace(width)
+        background = self.decimated[1]
+        lines = [(bx, by, (0.5, 0.5, 0.5, 0.2 + 0.5*(i + 1)/len(background)), 1) for i, (bx, by) in enumerate(background)]
+        return lines + [(x, y, (0.12, 0.47, 0.71, 1), 1.5)]
+
+
+class RingBuffer(object):
+    """
+    The last capacity (x, y) points of a trace, in a fixed size array.
+    """
+
+    def __init__(self, capacity):
+        self.data = np.empty((capacity, 2))
+        self.end = 0  # number of points ever added
+
+    def __len__(self):
+        return min(self.end, len(self.data))
+
+    # adds points, overwriting the oldest ones once it's full
+    def extend(self, x, y):
+        capacity = len(self.data)
+        n = len(x)
+        i = (self.end + np.arange(max(n - capacity, 0), n)) % capacity
+        self.data[i, 0] = x[-capacity:]
+        self.data[i, 1] = y[-capacity:]
+        self.end += n
+
+    # copies of the x and y values, oldest first
+    def arrays(self):
+        if self.end <= len(self.data):
+            a = self.data[:self.end]
+        else:
+            k = self.end % len(self.data)
+            a = np.concatenate([self.data[k:], self.data[:k]])
+        return a[:, 0].copy(), a[:, 1].copy()
+
+
+class LivePlot(LinePlot):
+    """
+    A plot of measurement data as it streams in over MQTT.
+    Each message on the plot's topic is expected to look like {'data': rows, 'pixel': {'label': ..., 'pixel': ...}, 'sweep': ...},
+    where rows is a list of tuples (e.g. (voltage, current, time, status)). Its points get appended to the trace for that pixel and sweep.
+    x and y are the row element to plot on each axis, or "power" for voltage times current.
+    Each trace is a RingBuffer, and only the newest max_traces traces are kept, so memory use is fixed.
+    Messages can be added from any thread.
+    """
+
+    # topic, axis labels and row elements to plot for the plots on the live data page
+    presets = {
+        'vt': {'topic': "data/raw/vt_measurement", 'xlabel': "Time [s]", 'ylabel': "Voltage [V]", 'x': 2, 'y': 0},
+        'iv': {'topic': "data/raw/iv_measurement", 'xlabel': "Voltage [V]", 'ylabel': "Current [A]", 'x': 0, 'y': 1},
+        'mppt': {'topic': "data/raw/mppt_measurement", 'xlabel': "Time [s]", 'ylabel': "Power [W]", 'x': 2, 'y': "power"},
+        'jt': {'topic': "data/raw/it_measurement", 'xlabel': "Time [s]", 'ylabel': "Current [A]", 'x': 2, 'y': 1},
+        'eqe': {'topic': "data/raw/eqe_measurement", 'xlabel': "Wavelength [nm]", 'ylabel': "EQE", 'x': 0, 'y': -1},
+    }
+
+    colors = [(0.12, 0.47, 0.71), (1.0, 0.5, 0.05), (0.17, 0.63, 0.17), (0.84, 0.15, 0.16), (0.58, 0.4, 0.74),
+              (0.55, 0.34, 0.29), (0.89, 0.47, 0.76), (0.5, 0.5, 0.5), (0.74, 0.74, 0.13), (0.09, 0.75, 0.81)]
+
+    def __init__(self, xlabel, ylabel, x, y, capacity=4096, max_traces=10):
+        super().__init__(xlabel, ylabel)
+        self.x = x
+        self.y = y
+        self.capacity = capacity
+        self.max_traces = max_traces
+        self.lock = threading.Lock()
+        self.traces = collections.OrderedDict()  # (pixel, sweep) --> RingBuffer, oldest first
+        self.n_traces = 0  # number of traces ever started, for picking colors
+        self.trace_colors = {}  # (pixel, sweep) --> color
+        self.signs = (1, 1)  # what x and y get multiplied by when they're drawn
+        self.changed = False  # there's data that hasn't been drawn yet
+
+    # one plot axis worth of values from an array of rows
+    @staticmethod
+    def column(rows, which):
+        if which == "power":
+            return rows[:, 0]*rows[:, 1]
+        return rows[:, which]
+
+    # adds the data from a message on the plot's topic
+    def add(self, m):
+        if isinstance(m, dict):
+            rows = m.get('data', [])
+            pixel = m.get('pixel') or {}
+            key = (f"{pixel.get('label', '')}_{pixel.get('pixel', '')}", m.get('sweep'))
+        else:
+            rows = m
+            key = ("", None)
+        try:
+            rows = np.array(rows, dtype=float, ndmin=2)
+            x, y = self.clean(self.column(rows, self.x), self.column(rows, self.y))
+        except (TypeError, ValueError, IndexError):
+            return
+        with self.lock:
+            if key not in self.traces:
+                self.traces[key] = RingBuffer(self.capacity)
+                self.trace_colors[key] = self.colors[self.n_traces % len(self.colors)]
+                self.n_traces += 1
+                while len(self.traces) > self.max_traces:
+                    old, _ = self.traces.popitem(last=False)
+                    del self.trace_colors[old]
+            self.traces[key].extend(x, y)
+            self.changed = True
+
+    # forgets all the traces
+    def clear(self):
+        with self.lock:
+            self.traces.clear()
+            self.trace_colors.clear()
+            self.changed = True
+
+    # true once after data has been added or cleared
+    def take_changed(self):
+        with self.lock:
+            changed = self.changed
+            self.changed = False
+        return changed
+
+    # the newest trace drawn on top and thicker
+    def lines(self, width):
+        with self.lock:
+            traces = [(*ring.arrays(), self.trace_colors[key]) for key, ring in self.traces.items()]
+        traces = [(x*self.signs[0], y*self.signs[1], color) for x, y, color in traces]
+        self.fit_limits([(x, y) for x, y, color in traces])
+        lines = []
+        for i, (x, y, color) in enumerate(traces):
+            newest = i == len(traces) - 1
+            lines.append((*decimate_minmax(x, y, max(width, 1)), (*color, 1 if newest else 0.6), 1.5 if newest else 1))
+        return lines
+
+
+class WebViewManager(object):
+    """
+    Looks after the app's webviews, which all use the default WebKit context, set up here to share as few
+    web processes as it can and to keep small caches.
+    A view's page gets loaded the first time it's shown and is kept (WebKit throttles pages nobody can see)
+    when it's hidden again. When the web processes take more than budget bytes, hidden views get their pages
+    unloaded, least recently shown first, and load them again next time they're shown.
+    """
+
+    def __init__(self, budget=None, processes=1):
+        self.budget = budget  # bytes the web processes may use, None for no limit
+        self.views = collections.OrderedDict()  # name --> {'view', 'uri', 'loaded', 'shown'}, least recently shown first
+        self.context = WebKit2.WebContext.get_default()
+        self.context.set_cache_model(WebKit2.CacheModel.DOCUMENT_VIEWER)
+        # only older WebKits can share processes between views, newer ones use a process per view
+        try:
+            self.context.set_process_model(WebKit2.ProcessModel.SHARED_SECONDARY_PROCESS if processes == 1 else WebKit2.ProcessModel.MULTIPLE_SECONDARY_PROCESSES)
+            self.context.set_web_process_count_limit(processes)
+        except AttributeError:
+            pass
+
+    # starts managing a webview that shows uri
+    def add(self, name, view, uri):
+        self.views[name] = {'view': view, 'uri': uri, 'loaded': False, 'shown': False}
+
+    # shows the named views (loading their pages if they need it) and hides the others
+    def show_only(self, names):
+        for name, v in self.views.items():
+            v['shown'] = name in names
+        for name in names:
+            if name in self.views:
+                v = self.views[name]
+                self.views.move_to_end(name)
+                if not v['loaded']:
+                    v['view'].load_uri(v['uri'])
+                    v['loaded'] = True
+        self.enforce()
+
+    # frees the memory used by a view's page
+    def unload(self, name):
+        v = self.views[name]
+        v['view'].stop_loading()
+        v['view'].load_uri("about:blank")
+        v['loaded'] = False
+        lg.debug(f"Unloaded the {name} webview to save memory")
+
+    # resident memory in bytes of our web processes
+    # they're looked for anywhere under us in the process tree, since sandboxed ones are children of bwrap, not us
+    @staticmethod
+    def process_memory():
+        children = collections.defaultdict(list)  # pid --> [(child pid, child command name)]
+        for stat in pathlib.Path("/proc").glob("[0-9]*/stat"):
+            try:
+                text = stat.read_text()
+                comm = text[text.index("(") + 1:text.rindex(")")]
+                ppid = int(text[text.rindex(")") + 2:].split()[1])
+                children[ppid].append((int(stat.parent.name), comm))
+            except (OSError, ValueError, IndexError):
+                pass
+        total = 0
+        page = os.sysconf("SC_PAGE_SIZE")
+        todo = [os.getpid()]
+        while len(todo) > 0:
+            for pid, comm in children.pop(todo.pop(), []):
+                todo.append(pid)
+                if comm.startswith("WebKitWebProces"):
+                    try:
+                        total += int(pathlib.Path(f"/proc/{pid}/statm").read_text().split()[1])*page
+                    except (OSError, ValueError, IndexError):
+                        pass  # it's gone
+        return total
+
+    # unloads hidden views' pages, least recently shown first, while we're over budget
+    # one per call, since it takes the web process a moment to give the memory back
+    def enforce(self):
+        if (self.budget is not None) and (self.process_memory() > self.budget):
+            for name, v in self.views.items():
+                if v['loaded'] and not v['shown']:
+                    self.unload(name)
+                    break
+        return True
+
+
+class LogView(logging.Handler):
+    """
+    A logging handler that shows records in a GtkTextView.
+    Records from any thread go into a deque and get written to the view's buffer together,
+    at most every interval ms. The buffer is kept to max_lines lines by trimming from the top,
+    and the view only follows new lines if it was scrolled to the bottom already.
+    """
+
+    def __init__(self, view, max_lines=10000, interval=50):
+        super().__init__()
+        self.view = view
+        self.buffer = view.get_buffer()
+        self.end_mark = self.buffer.create_mark(None, self.buffer.get_end_iter(), False)
+        self.interval = interval
+        self.pending = collections.deque(maxlen=max_lines)  # formatted records not written yet
+        self.scheduled = False  # a flush is coming
+        self.max_lines = max_lines
+
+    @property
+    def max_lines(self):
+        return self._max_lines
+
+    @max_lines.setter
+    def max_lines(self, n):
+        self._max_lines = n
+        self.pending = collections.deque(self.pending, maxlen=n)  # anything more would get trimmed anyway
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        if not self.scheduled:
+            self.scheduled = True
+            GLib.timeout_add(self.interval, self.flush_pending)
+
+    # writes out everything that's pending (in the GLib main loop)
+    def flush_pending(self):
+        self.scheduled = False
+        lines = []
+        while True:
+            try:
+                lines.append(self.pending.popleft())
+            except IndexError:
+                break
+        if len(lines) == 0:
+            return False
+        adj = self.view.get_vadjustment()
+        at_bottom = adj.get_value() >= adj.get_upper() - adj.get_page_size() - 1
+        buf = self.buffer
+        buf.insert(buf.get_end_iter(), "\n".join(lines) + "\n")
+        extra = buf.get_line_count() - 1 - self.max_lines  # the last line is the empty one after the final newline
+        if extra > 0:
+            buf.delete(buf.get_start_iter(), buf.get_iter_at_line(extra))
+        if at_bottom and (self.view.get_buffer() == buf):
+            buf.move_mark(self.end_mark, buf.get_end_iter())
+            self.view.scroll_mark_onscreen(self.end_mark)
+        return False
+
+
+class LogArchive(logging.Handler):
+    """
+    A logging handler that keeps every record in an SQLite database, indexed by time and level,
+    with full-text search of the messages when SQLite has FTS5 (or else a slower substring search).
+    Records get written in batches, once batch_size have built up or on flush(), which the log pipeline
+    calls whenever it goes quiet. Pruning old records happens a chunk at a time in flush() too.
+    Queries come from the GLib main loop on their own connection.
+    """
+
+    prune_chunk = 2000  # most old records deleted in one go
+    prune_time = 0.05  # seconds a flush can spend pruning
+
+    def __init__(self, path, batch_size=500):
+        super().__init__()
+        self.path = pathlib.Path(path)
+        self.batch_size = batch_size
+        self.batch = []  # (time, level, source, message) rows not written yet
+        self.prune_before = None  # records older than this time still need deleting
+        self.writer = None  # connection for the log pipeline thread, made on first use
+        self.reader = None  # connection for queries, None if the archive couldn't be opened
+        self.fts = False  # we have a full-text index
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            con = self.connect()
+            con.execute("PRAGMA journal_mode=WAL")  # so queries don't wait on writes
+            con.execute("CREATE TABLE IF NOT EXISTS log (id INTEGER PRIMARY KEY, time REAL, level INTEGER, source TEXT, msg TEXT)")
+            con.execute("CREATE INDEX IF NOT EXISTS log_time ON log(time)")
+            con.execute("CREATE INDEX IF NOT EXISTS log_level ON log(level)")
+            try:
+                con.execute("CREATE VIRTUAL TABLE IF NOT EXISTS log_fts USING fts5(msg, content='log', content_rowid='id')")
+                con.execute("CREATE TRIGGER IF NOT EXISTS log_fts_insert AFTER INSERT ON log BEGIN INSERT INTO log_fts(rowid, msg) VALUES (new.id, new.msg); END")
+                con.execute("CREATE TRIGGER IF NOT EXISTS log_fts_delete AFTER DELETE ON log BEGIN INSERT INTO log_fts(log_fts, rowid, msg) VALUES ('delete', old.id, old.msg); END")
+                self.fts = True
+            except sqlite3.OperationalError:
+                lg.debug("SQLite has no FTS5, log searches will be slow")
+            con.commit()
+            self.reader = con
+        except (OSError, sqlite3.Error) as e:
+            lg.warning(f"Could not open the log archive {self.path}: {e}")
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+
+    def emit(self, record):
+        if self.reader is not None:
+            self.batch.append((record.created, record.levelno, getattr(record, 'source', record.name), record.getMessage()))
+            if len(self.batch) >= self.batch_size:
+                self.write()
+
+    # writes out the batch
+    def write(self):
+        with self.lock:
+            if len(self.batch) > 0:
+                batch = self.batch
+                self.batch = []
+                try:
+                    if self.writer is None:
+                        self.writer = self.connect()
+                    self.writer.executemany("INSERT INTO log (time, level, source, msg) VALUES (?, ?, ?, ?)", batch)
+                    self.writer.commit()
+                except sqlite3.Error:
+                    pass  # logging about failing to log would only make it worse
+
+    # writes out the batch and deletes chunks of any records waiting to be pruned for up to prune_time
+    def flush(self):
+        self.write()
+        end = time.monotonic() + self.prune_time
+        while (self.prune_before is not None) and (time.monotonic() < end):
+            with self.lock:
+                if self.reader is None:
+                    self.prune_before = None
+                    break
+                try:
+                    if self.writer is None:
+                        self.writer = self.connect()
+                    cur = self.writer.execute("DELETE FROM log WHERE id IN (SELECT id FROM log WHERE time < ? ORDER BY time LIMIT ?)", (self.prune_before, self.prune_chunk))
+                    self.writer.commit()
+                    if cur.rowcount < self.prune_chunk:
+                        self.prune_before = None  # all done
+                except sqlite3.Error:
+                    self.prune_before = None
+
+    # forgets records older than some days. they get deleted bit by bit on later flushes
+    def prune(self, days):
+        with self.lock:
+            self.prune_before = time.time() - days*24*60*60
+
+    # up to limit (id, time, level, source, message) rows at or above level, from source and containing text,
+    # in id (so time) order. they're the newest ones, or the newest before id before,
+    # or the oldest after id after or from time since on
+    def query(self, level=logging.NOTSET, source=None, text=None, before=None, after=None, since=None, limit=500):
+        if self.reader is None:
+            return []
+        self.write()
+        tables = "log"
+        rid = "log.id"  # what rows are ordered and paged by
+        where = ["log.level >= ?"]
+        args = [level]
+        if source is not None:
+            where.append("log.source = ?")
+            args.append(source)
+        if text is not None:
+            if self.fts:
+                # driven from the full-text index, so it can stop as soon as it has enough matches
+                tables = "log_fts JOIN log ON log.id = log_fts.rowid"
+                rid = "log_fts.rowid"
+                where.append("log_fts MATCH ?")
+                args.append(" ".join('"' + word.replace('"', '""') + '"*' for word in text.split()))
+            else:
+                where.append("log.msg LIKE ? ESCAPE '\\'")
+                args.append("%" + re.sub(r"([%_\\])", r"\\\1", text) + "%")
+        if before is not None:
+            where.append(f"{rid} < ?")
+            args.append(before)
+        if after is not None:
+            where.append(f"{rid} > ?")
+            args.append(after)
+        if since is not None:
+            # where that time starts, found with the time index
+            try:
+                start = self.reader.execute("SELECT id FROM log WHERE time >= ? ORDER BY time LIMIT 1", (since,)).fetchone()
+            except sqlite3.Error:
+                start = None
+            if start is None:
+                return []
+            where.append(f"{rid} >= ?")
+            args.append(start[0])
+        newest = (after is None) and (since is None)
+        sql = f"SELECT log.id, log.time, log.level, log.source, log.msg FROM {tables} WHERE {' AND '.join(where)} ORDER BY {rid} {'DESC' if newest else 'ASC'} LIMIT ?"
+        try:
+            rows = self.reader.execute(sql, args + [limit]).fetchall()
+        except sqlite3.Error as e:
+            lg.debug(f"Log archive query failed: {e}")
+            return []
+        return rows[::-1] if newest else rows
+
+
+class LogBrowser(object):
+    """
+    Shows the LogArchive rows matching a filter in a text buffer, a page at a time.
+    More pages get loaded as the view reaches either end, and pages from the other end get dropped,
+    so the buffer never holds more than max_pages pages however big the archive is.
+    """
+
+    def __init__(self, archive, buffer, page_size=500, max_pages=3):
+        self.archive = archive
+        self.buffer = buffer
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.filter = {}  # LogArchive.query arguments
+        self.rows = collections.deque()  # (id, lines) of the rows shown
+
+    # a row as a line of text, formatted like the live log
+    @staticmethod
+    def format(row):
+        rid, t, level, source, msg = row
+        return f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t))},{int(t % 1 * 1000):03d}|{logging.getLevelName(level)}|{msg}\n"
+
+    def set_filter(self, **filter):
+        self.filter = filter
+
+    # shows the newest matching rows
+    def show_end(self):
+        self.show(self.archive.query(**self.filter, limit=self.page_size))
+
+    # shows matching rows from a time on
+    def show_from(self, since):
+        self.show(self.archive.query(**self.filter, since=since, limit=self.page_size))
+
+    def show(self, rows):
+        text = [self.format(row) for row in rows]
+        self.buffer.set_text("".join(text))
+        self.rows = collections.deque((row[0], t.count("\n")) for row, t in zip(rows, text))
+
+    # adds the page before the first row shown, returns True if there was one
+    def older(self):
+        if len(self.rows) == 0:
+            return False
+        rows = self.archive.query(**self.filter, before=self.rows[0][0], limit=self.page_size)
+        if len(rows) == 0:
+            return False
+        text = [self.format(row) for row in rows]
+        self.buffer.insert(self.buffer.get_start_iter(), "".join(text))
+        self.rows.extendleft((row[0], t.count("\n")) for row, t in zip(reversed(rows), reversed(text)))
+        # drop rows from the end
+        lines = 0
+        while len(self.rows) > self.page_size*self.max_pages:
+            lines += self.rows.pop()[1]
+        if lines > 0:
+            self.buffer.delete(self.buffer.get_iter_at_line(self.buffer.get_line_count() - 1 - lines), self.buffer.get_end_iter())
+        return True
+
+    # adds the page after the last row shown, returns True if there was one
+    def newer(self):
+        if len(self.rows) == 0:
+            return False
+        rows = self.archive.query(**self.filter, after=self.rows[-1][0], limit=self.page_size)
+        if len(rows) == 0:
+            return False
+        text = [self.format(row) for row in rows]
+        self.buffer.insert(self.buffer.get_end_iter(), "".join(text))
+        self.rows.extend((row[0], t.count("\n")) for row, t in zip(rows, text))
+        # drop rows from the start
+        lines = 0
+        while len(self.rows) > self.page_size*self.max_pages:
+            lines += self.rows.popleft()[1]
+        if lines > 0:
+            self.buffer.delete(self.buffer.get_start_iter(), self.buffer.get_iter_at_line(lines))
+        return True
+
+
+class CommandPublisher(object):
+    """
+    Publishes outbound MQTT messages from a worker thread so that gtk callbacks never block on the network.
+    Messages wait in a bounded queue, then are tracked until the broker has them or they time out.
+    Completion callbacks are called in the GLib main loop as callback(topic, ok)
+    """
+
+    def __init__(self, maxsize=100, timeout=10, on_change=None):
+        self.client = None  # the paho client to publish with, (re)set by whoever manages the connection
+        self.timeout = timeout  # default number of seconds a message has to make it to the broker
+        self.on_change = on_change  # called in the main loop with the new in-flight count when it changes
+        self._q = queue.Queue(maxsize=maxsize)
+        self._in_flight = []  # messages handed to paho that are not yet published (only touched by the worker)
+        self._n_in_flight = 0  # queued + handed to paho
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="mqtt-publisher", daemon=True)
+
+    # number of messages that have been accepted but are not yet done
+    @property
+    def in_flight(self):
+        return self._n_in_flight
+
+    def start(self):
+        self._worker.start()
+
+    # stop the worker, giving it up to timeout seconds to finish what it has
+    def stop(self, timeout=2):
+        self._stop.set()
+        if self._worker.is_alive():
+            self._worker.join(timeout)
+
+    # queue a message for publishing, never blocks
+    # returns False if the message could not be queued
+    def publish(self, topic, payload, qos=2, retain=False, timeout=None, callback=None):
+        if timeout is None:
+            timeout = self.timeout
+        item = (topic, payload, qos, retain, time.monotonic() + timeout, callback)
+        try:
+            self._q.put_nowait(item)
+        except queue.Full:
+            lg.error(f"Outbound message queue is full. Dropped message for {topic}")
+            if callback is not None:
+                GLib.idle_add(self._call, callback, topic, False)
+            return False
+        self._count(1)
+        return True
+
+    def _count(self, change):
+        with self._lock:
+            self._n_in_flight += change
+            n = self._n_in_flight
+        if self.on_change is not None:
+            GLib.idle_add(self._call, self.on_change, n)
+
+    # runs a callback in the main loop exactly once
+    def _call(self, fn, *args):
+        fn(*args)
+        return False
+
+    def _finish(self, topic, ok, callback):
+        self._count(-1)
+        if callback is not None:
+            GLib.idle_add(self._call, callback, topic, ok)
+
+    def _send(self, item):
+        topic, payload, qos, retain, deadline, callback = item
+        client = self.client
+        if client is None:
+            lg.warning(f"Not connected. Unable to send message to {topic}")
+            self._finish(topic, False, callback)
+            return
+        try:
+            info = client.publish(topic, payload, qos=qos, retain=retain)
+        except Exception as e:
+            lg.warning(f"Failed to publish to {topic}: {e}")
+            self._finish(topic, False, callback)
+            return
+        # paho holds on to qos>0 messages it could not send yet, so those still get a chance
+        if info.rc not in [mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN]:
+            lg.warning(f"Failed to publish to {topic}: {mqtt.error_string(info.rc)}")
+            self._finish(topic, False, callback)
+        else:
+            self._in_flight.append((info, topic, deadline, callback))
+
+    # checks up on the messages paho is working on
+    def _reap(self):
+        now = time.monotonic()
+        still_flying = []
+        for info, topic, deadline, callback in self._in_flight:
+            if info.is_published():
+                self._finish(topic, True, callback)
+            elif now > deadline:
+                lg.warning(f"Timed out publishing to {topic}")
+                self._finish(topic, False, callback)
+            else:
+                still_flying.append((info, topic, deadline, callback))
+        self._in_flight = still_flying
+
+    def _run(self):
+        while not (self._stop.is_set() and self._q.empty() and (len(self._in_flight) == 0)):
+            # poll quickly only while there's something to watch
+            if len(self._in_flight) > 0 or self._stop.is_set():
+                wait = 0.02
+            else:
+                wait = 0.5
+            try:
+                item = self._q.get(timeout=wait)
+            except queue.Empty:
+                item = None
+            if item is not None:
+                if item[4] < time.monotonic():
+                    lg.warning(f"Timed out waiting to publish to {item[0]}")
+                    self._finish(item[0], False, item[5])
+                else:
+                    self._send(item)
+            self._reap()
+
+
+class CommandTracker(object):
+    """
+    Tags outbound command messages with a request ID. Commands sent with a callback get a future
+    that the backend's reply on response/<id> resolves, and their round trip latencies are collected per command.
+    Commands sent without one aren't waited on, so they don't count towards the latencies or timeouts.
+    """
+
+    default_timeout = 30  # seconds to wait for a reply
+    # some commands legitimately take a long time to answer
+    timeouts = {'home': 300, 'goto': 120, 'round_robin': 300, 'check_health': 60}
+
+    def __init__(self, publisher, encode, on_latency=None):
+        self.publisher = publisher  # a CommandPublisher
+        self.encode = encode  # turns (topic, message dict) into a payload
+        self.on_latency = on_latency  # called in the main loop as on_latency(cmd, stats) after a round trip
+        self.stats = {}  # cmd --> {'n':, 'last':, 'total':, 'max':, 'timeouts':}
+        self._pending = {}  # request ID --> (future, cmd, start time)
+        self._lock = threading.Lock()
+
+    # number of commands still waiting on a reply
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    # send a command. if callback is given, returns a concurrent.futures.Future that resolves with the reply
+    # and callback(future) is called in the main loop when it's done. otherwise returns None
+    def send(self, msg, topic="cmd/util", timeout=None, callback=None):
+        cmd = msg.get('cmd', 'unknown')
+        if timeout is None:
+            timeout = self.timeouts.get(cmd, self.default_timeout)
+        rid = uuid.uuid4().hex
+        msg['id'] = rid
+        if callback is None:  # nobody's waiting on a reply (the publisher logs it if sending fails)
+            self.publisher.publish(topic, self.encode(topic, msg))
+            return None
+        fut = concurrent.futures.Future()
+        with self._lock:
+            self._pending[rid] = (fut, cmd, time.monotonic())
+        fut.add_done_callback(lambda f: self._forget(rid, f))
+        fut.add_done_callback(lambda f: GLib.idle_add(self._call, callback, f))
+        GLib.timeout_add(int(timeout * 1000), self._expire, rid)
+        self.publisher.publish(topic, self.encode(topic, msg), callback=lambda t, ok: ok or self._fail(rid, f"Unable to send {cmd} command"))
+        return fut
+
+    # resolves the future for a request ID with its reply (safe to call from the MQTT thread)
+    def resolve(self, rid, reply):
+        with self._lock:
+            entry = self._pending.get(rid)
+        if entry is None:
+            return False  # not ours, already timed out or cancelled
+        fut, cmd, t0 = entry
+        self._record(cmd, time.monotonic() - t0)
+        try:
+            fut.set_result(reply)
+        except concurrent.futures.InvalidStateError:
+            pass  # lost a race with cancel or timeout
+        return True
+
+    # cancels a command that has not been answered yet
+    def cancel(self, fut):
+        return fut.cancel()
+
+    def _call(self, fn, *args):
+        fn(*args)
+        return False
+
+    def _forget(self, rid, fut):
+        with self._lock:
+            self._pending.pop(rid, None)
+
+    def _fail(self, rid, reason, timed_out=False):
+        with self._lock:
+            entry = self._pending.get(rid)
+        if entry is not None:
+            fut, cmd, t0 = entry
+            if timed_out == True:
+                lg.debug(f"No reply to {cmd} command {rid} after {time.monotonic() - t0:.1f}s")
+                self._record(cmd, None)
+            try:
+                fut.set_exception(TimeoutError(reason))
+            except concurrent.futures.InvalidStateError:
+                pass
+        return False
+
+    def _expire(self, rid):
+        return self._fail(rid, "Timed out waiting for a reply", timed_out=True)
+
+    # latency is None for a timeout
+    def _record(self, cmd, latency):
+        with self._lock:
+            st = self.stats.setdefault(cmd, {'n': 0, 'last': None, 'total': 0.0, 'max': 0.0, 'timeouts': 0})
+            if latency is None:
+                st['timeouts'] += 1
+            else:
+                st['n'] += 1
+                st['last'] = latency
+                st['total'] += latency
+                st['max'] = max(st['max'], latency)
+            st = dict(st)
+        if self.on_latency is not None:
+            GLib.idle_add(self._call, self.on_latency, cmd, st)
 
 
 class App(Gtk.Application):
@@ -79,6 +2530,7 @@ class App(Gtk.Application):
         self.main_win = None
         self.mqtt_setup = False
         self.mqtt_connecting = False
+        self.mqtt_connected = False
         # to keep track of the two toggle buttons in the utility panel
         self.all_mux_switches_open = True
         self.in_iv_mode = True
@@ -87,9 +2539,41 @@ class App(Gtk.Application):
         self.psu_cal_time = None
         self.iv_cal_time = None
         self.array_drawing_handle = None
-        self.layout_drawing_handle = None
-        self.spectrum_plot_handle = None
+        self.render_cache = SurfaceCache()  # rendered versions of the drawings we show
+        self.array_view = None  # zoom/pan state of the array overview
+        self.array_drag = None  # where the last array overview pan drag event was
+        self.array_lasso = None  # screen points of the lasso being drawn on the array overview
+        self.array_click = None  # (GLib source, args) of a click on the array overview waiting to see if it's a double click
+        self.array_double_clicked = False  # the next button release on the array overview ends a double click
+        self.array_index = None  # for finding what's under the mouse on the array overview
+        self.pixel_overlay = PixelOverlay()  # live pixel status shown over the array overview
+        self.array_dirty = True  # the array overview drawing needs rebuilding
+        self.array_drawing_angle = None  # rotation angle the array overview was last drawn with
+        self.layout_drawing = None  # the LayoutDrawing in the layout popover
+        self.layout_handles = {}  # parsed layout drawings for when the prerendered ones aren't sharp enough
+        self.spectrum_plot = SpectrumPlot()  # the spectrum shown in the spectrum dialog
+        self.spectrum_dialog = None  # built on first use, then hidden and shown again
         self.want_spectrum = False
+        self.spectrum_frames = LatestFrame()  # newest payload from the live spectrum topic
+        self.spectrum_stream_id = None  # GLib source that draws live spectrum frames
+        self.spectrum_drawing = False  # a live spectrum frame has been queued for drawing but not drawn yet
+        self.spectrum_fps = 10  # most live spectrum frames we draw per second
+        self.spectrum_time = None  # timestamp of the spectrum being shown
+        self.calibration_history = None  # CalibrationHistory of what the backend has sent
+        self.live_plots = {}  # plot name --> (LivePlot, its drawing area) for the live data page
+        self.live_plot_topics = {}  # MQTT topic --> the LivePlot its data goes to
+        self.plot_widgets = {}  # plot name --> the widget showing it (a drawing area or a webview)
+        self.plot_rates = {}  # plot name --> updates per second it gets (0 when nobody can see it)
+        self.live_plot_drawn = {}  # plot name --> when it was last redrawn
+        self.plot_fps = 5  # update rate for plots someone's looking at
+        self.plot_idle_rate = 1  # update rate for plots that can be seen but the window doesn't have focus
+        self.window_shown = True  # the main window isn't minimized
+        self.webviews = None  # WebViewManager for the webviews that are in use
+        self.log_archive = None  # LogArchive of everything that gets logged
+        self.log_browser = None  # for showing filtered parts of the log archive in the log pane
+        self.live_plots_paused = False  # the user has turned plot updates off
+        self.invert_voltage = False  # live plots show voltage times -1
+        self.invert_current = False  # live plots show current times -1
 
         # allow configuration file location to be specified by command line argument
         self.add_main_option(
@@ -101,6 +2585,16 @@ class App(Gtk.Application):
             None,
         )
 
+        # for measuring how fast the performance sensitive bits are
+        self.add_main_option(
+            "benchmark",
+            ord("b"),
+            GLib.OptionFlags.NONE,
+            GLib.OptionArg.NONE,
+            "Run the performance benchmarks and exit",
+            None,
+        )
+
     def do_startup(self):
         lg.debug(f"Starting up app from {__file__}")
         Gtk.Application.do_startup(self)
@@ -144,28 +2638,29 @@ class App(Gtk.Application):
 
             self.logTB = self.b.get_object("tbLog")  # log text buffer
             self.ltv = self.b.get_object("ltv")  # log text view
-            self.log_win_adj = self.b.get_object("vert_log_win_scroll_adj")
             # drawings/plots
             self.array_pic = self.b.get_object("array_overview")
             self.array_pic.connect("draw", self.on_array_pic_draw)
+            self.array_pic.add_events(Gdk.EventMask.SCROLL_MASK | Gdk.EventMask.SMOOTH_SCROLL_MASK | Gdk.EventMask.BUTTON_PRESS_MASK | Gdk.EventMask.BUTTON_RELEASE_MASK | Gdk.EventMask.POINTER_MOTION_MASK)
+            self.array_pic.connect("scroll-event", self.on_array_pic_scroll)
+            self.array_pic.connect("button-press-event", self.on_array_pic_press)
+            self.array_pic.connect("button-release-event", self.on_array_pic_release)
+            self.array_pic.connect("motion-notify-event", self.on_array_pic_motion)
             self.subs_pic = self.b.get_object("substrate_pic")
             self.subs_pic.connect("draw", self.on_subs_pic_draw)
 
-            def myWrite(buf):
-                # the log update should not be done on the main gui thread
-                # or else segfault badness
-                GLib.idle_add(self.append_to_log_window, str(buf))
-
-            def myFlush():
-                pass
-
-            self.logTB.write = myWrite
-            self.logTB.flush = myFlush
-            uiLog = logging.StreamHandler(stream=self.logTB)
+            # the log view gets written to in batches from the GLib main loop
+            uiLog = LogView(self.ltv)
             uiLog.setLevel(logging.INFO)
             uiLog.set_name("ui")
             uiLog.setFormatter(uiLogFormat)
-            lg.addHandler(uiLog)
+            logPipe.add_handler(uiLog)
+
+            # everything logged also goes into an archive the log pane can search
+            self.log_archive = LogArchive(pathlib.Path(GLib.get_user_data_dir()) / "control-ui" / "log.sqlite3")
+            logPipe.add_handler(self.log_archive, flood_control=False)  # it should have everything, even during a flood
+            self.log_browser = LogBrowser(self.log_archive, Gtk.TextBuffer())
+            self.b.get_object("log_scroll").connect("edge-reached", self.on_log_edge_reached)
             lg.debug("Gui logging setup.")
 
             example_config_file_name = "example_config.yaml"
@@ -254,6 +2749,11 @@ class App(Gtk.Application):
 
             self.config = merge_dicts([base_config] + aux_configs)
 
+            # the backend gets the config by this hash rather than with every message
+            self.config_hash = config_digest(self.config)
+            self.published_config_hash = None
+            lg.debug(f"Configuration hash: {self.config_hash}")
+
             pp = pprint.PrettyPrinter(compact=True, width=140, sort_dicts=False)
             lg.debug(pp.pformat(self.config))
 
@@ -267,6 +2767,50 @@ class App(Gtk.Application):
             except:
                 pass
 
+            try:
+                self.render_cache.budget = self.config['UI']['render_cache_mb']*2**20
+            except:
+                pass
+
+            try:
+                self.spectrum_fps = self.config['UI']['spectrum_fps']
+            except:
+                pass
+
+            try:
+                logPipe.get_handler("ui").max_lines = self.config['UI']['log_lines']
+            except:
+                pass
+
+            try:
+                logPipe.flood.rate = self.config['UI']['log_rate']
+            except:
+                pass
+
+            try:
+                logPipe.flood.burst = self.config['UI']['log_burst']
+            except:
+                pass
+
+            try:
+                self.log_archive.prune(self.config['UI']['log_archive_days'])
+            except:
+                pass
+
+            try:
+                history_dir = pathlib.Path(self.config['UI']['calibration_history_dir']).expanduser()
+            except:
+                history_dir = pathlib.Path(GLib.get_user_data_dir()) / "control-ui" / "calibration"
+            self.calibration_history = CalibrationHistory(history_dir)
+            for kind, attr in [("spectrum", "iv_cal_time"), ("eqe", "eqe_cal_time")]:
+                latest = self.calibration_history.index(kind)
+                if len(latest) > 0:
+                    setattr(self, attr, float(latest[-1]['timestamp']))
+            psu = [self.calibration_history.index(p.stem) for p in history_dir.glob("psu*.idx")]
+            psu = [float(idx[-1]['timestamp']) for idx in psu if len(idx) > 0]
+            if len(psu) > 0:
+                self.psu_cal_time = max(psu)
+
             # get dimentions of substrate array to generate designators
             self.counts = self.config["substrates"]["number"]
             self.spacings = self.config["substrates"]["spacing"]
@@ -278,16 +2822,14 @@ class App(Gtk.Application):
                 lab_flips = self.config["substrates"]["flip_labels"]
             except:
                 lab_flips = [False]*len(self.counts)
-            label_grid, position_grid = self.make_meshgrids(self.counts, self.spacings, polarities, lab_flips)
+            label_grid, position_grid = make_meshgrids(self.counts, self.spacings, polarities, lab_flips)
 
             # HINT: visualize 1 and 2d meshgrids by printing transposed like this
             # for comparison to the physical layout to see if it's right:
             # print(label_meshgrid.T)
 
-            labels = self.grid_to_list(label_grid)
-            pos_list = self.grid_to_list(position_grid)
-            self.substrate_locations = dict(zip(labels, pos_list))
-            self.substrate_designators = sorted(labels)
+            self.substrate_locations = SlotLocations(label_grid, position_grid)
+            self.substrate_designators = sorted(self.substrate_locations.labels.tolist())
             ns = len(self.substrate_designators)
 
             # are we using a stage controller here?
@@ -430,8 +2972,8 @@ class App(Gtk.Application):
             npix = []  # number of pixels for each layout
             areas = []  # area list for each layout
             pads = []  # pin pad list for each layout
-            self.layout_drawings = {}  # holds our pictures of the layouts
-            self.rotated_layout_drawings = {}  # holds our pictures of the layouts
+            self.layout_drawings = {}  # holds our pictures of the layouts (drawn or loaded from the cache on first use)
+            layout_cache_dir = pathlib.Path(GLib.get_user_cache_dir()) / "control-ui" / "layouts"
             if 'substrates' in self.config:
                 if 'layouts' in self.config['substrates']:
                     for layout_name, val in self.config['substrates']['layouts'].items():
@@ -441,11 +2983,10 @@ class App(Gtk.Application):
                                 pads.append(val['pads'])
                                 npix.append(len(val['pads']))
                                 areas.append(val['areas'])
-                                d, dr = self.draw_layout(val['pads'], val['areas'], val['locations'], val['shapes'], val['size'], self.spacings, layout_name)
-                                self.layout_drawings[layout_name] = d
-                                self.rotated_layout_drawings[layout_name] = dr
+                                self.layout_drawings[layout_name] = LayoutDrawing(layout_name, val, self.spacings, self.config['UI']['gui_drawing_rotation_angle'], layout_cache_dir)
             self.layouts = layouts
             lnd = 0  # default starting layout number
+            self.pixel_geometry = PixelGeometry(self.config['substrates']['layouts'])
 
             # slot configuration stuff
             self.slot_config_tv = self.b.get_object("substrate_tree")
@@ -478,12 +3019,16 @@ class App(Gtk.Application):
             sc.add_class(Gtk.STYLE_CLASS_MONOSPACE)
             self.iv_dev_box.set_width_chars(selection_box_length)
             self.iv_dev_box.connect('changed', self.update_measure_count)
+            self.iv_dev_box.connect('activate', self.on_dev_box_edit)
+            self.iv_dev_box.connect('focus-out-event', self.on_dev_box_edit)
 
             self.eqe_dev_box = self.b.get_object("eqe_devs")
             sc = self.eqe_dev_box.get_style_context()
             sc.add_class(Gtk.STYLE_CLASS_MONOSPACE)
             self.eqe_dev_box.set_width_chars(selection_box_length)
             self.eqe_dev_box.connect('changed', self.update_measure_count)
+            self.eqe_dev_box.connect('activate', self.on_dev_box_edit)
+            self.eqe_dev_box.connect('focus-out-event', self.on_dev_box_edit)
 
             self.do_dev_store_update_tasks(self.iv_store)
             self.do_dev_store_update_tasks(self.eqe_store)
@@ -516,6 +3061,58 @@ class App(Gtk.Application):
                     for uri in self.config["network"]['live_data_uris']:
                         self.uris.append(uri)
 
+            # the live data page gets drawn here unless the config asks for the plot server webviews
+            try:
+                native_live_plots = self.config['UI']['native_live_plots']
+            except:
+                native_live_plots = True
+            if native_live_plots:
+                self.make_live_plots()
+                self.wvids = []  # nothing left to load
+            else:
+                for wvid in self.wvids:
+                    self.plot_widgets[wvid[:-len("_wv")]] = self.b.get_object(wvid)
+            try:
+                self.plot_idle_rate = self.config['UI']['plot_idle_rate']
+            except:
+                pass
+
+            # load webviews only when they're shown and keep them under a memory budget
+            try:
+                webview_budget = self.config['UI']['webview_memory_mb']*2**20
+            except:
+                webview_budget = None
+            try:
+                webview_processes = self.config['UI']['webview_processes']
+            except:
+                webview_processes = 1
+            self.webviews = WebViewManager(webview_budget, webview_processes)
+            for i, wvid in enumerate(self.wvids):
+                if (self.b.get_object(wvid).get_visible() == True) and (i < len(self.uris)):
+                    self.webviews.add(wvid, self.b.get_object(wvid), self.uris[i])
+            if (self.b.get_object("custom_wv").get_visible() == True) and (len(self.uris) > 0):
+                self.webviews.add("custom_wv", self.b.get_object("custom_wv"), self.uris[-1])  # should always be the last webview and uri
+            GLib.timeout_add_seconds(10, self.webviews.enforce)
+
+            # start the outbound message publisher
+            try:
+                publish_timeout = self.config["network"]["publish_timeout"]
+            except:
+                publish_timeout = 10
+            self.outbox = CommandPublisher(timeout=publish_timeout, on_change=self.on_in_flight_change)
+            self.outbox.start()
+
+            # how messages get encoded on the wire
+            try:
+                wire_mode = self.config["network"]["wire_format"]
+            except:
+                wire_mode = "auto"
+            self.wire = WireFormat(wire_mode)
+
+            # request/response tracking for commands
+            self.commands = CommandTracker(self.outbox, self.wire.encode, on_latency=self.on_command_latency)
+            self.setup_latency_view()
+
             # start MQTT client
             self._start_mqtt()
 
@@ -586,123 +3183,134 @@ class App(Gtk.Application):
             self.main_win = self.b.get_object("mainWindow")
             self.main_win.set_application(self)
 
+            # for pausing plots nobody can see
+            self.main_win.connect("window-state-event", self.on_main_window_state)
+            self.main_win.connect("notify::is-active", self.on_main_window_active)
+            self.update_plot_rates(force=True)
+
         self.main_win.present()
 
-    # take a mesh grid and turn it into a list
-    def grid_to_list(self, grid):
-        lis = []
-        fl = grid.flat
-        for x in fl:
-            lis.append(x)
-        return lis
-
-    # use some variables from the config file to generate
-    # arrays of labels and positions for each substrate slot in the setup
-    def make_meshgrids(self, counts, spacings, polarities, lab_flips):
-        d = len(counts)  # number of dimensions
-        # the labeling start character is kinda wonky so we can handle it here based on d
-        if d == 1:
-            label_starts = ['A']
-        elif d == 2:
-            label_starts = ['1','A']
-        else:
-            label_starts = ['a','1','A']
-        ranges = [np.array(range(x)) for x in counts]
-        label_ranges =    [r+ord(label_starts[i]) for i,r in enumerate(ranges)]
-        location_ranges = [r*spacings[i] for i,r in enumerate(ranges)]
-        # center the location ranges on zero and flip them if the axis polarity value is 1
-        location_ranges = [(r-r.max()/2)*(-2*polarities[i]+1) for i,r in enumerate(location_ranges)]  
-
-        # make some empty grids of the right shapes and types
-        label_meshgrid = np.empty(list(counts), dtype=np.dtype(f'U{d}'))
-        pos_meshgrid = np.empty(list(counts), dtype=object)
-        #labels = []
-        #positions = []
-
-        # populate the grids
-        for idx, x in np.ndenumerate(label_meshgrid):
-            label = ''
-            pos = []
-            for j,i in enumerate(idx):
-                label += chr(label_ranges[j][i])
-                pos.append(location_ranges[j][i])
-            label_meshgrid[idx] = label
-            pos_meshgrid[idx] = pos
-            #labels.append(label)
-            #positions.append(pos)
-
-        # flip the labels if the config file says so
-        for i, t in enumerate(lab_flips):
-            if t == True:
-                label_meshgrid = np.flip(label_meshgrid, i)
-
-        return label_meshgrid, pos_meshgrid
-    
-    # cleans up spectrum dialog window
+    # hides the spectrum dialog so it can be shown again with the next spectrum
     def on_spec_dialog_finish(self, dialog, *args, **kwargs):
-        dialog.destroy()
-        self.spectrum_plot_handle = None
+        dialog.hide()
+        self.b.get_object("spectrum_stream_but").set_active(False)
+        return True  # keeps delete-event from destroying it
 
     # handles rendering of spectrum plot
     def on_spec_plot_draw(self, drawing_area, cairo_context):
-        if self.spectrum_plot_handle is None:
-            drawing_area.queue_draw()
+        self.spectrum_plot.draw(cairo_context, drawing_area.get_allocated_width(), drawing_area.get_allocated_height())
+        self.spectrum_drawing = False
+
+    # the user toggled live spectrum streaming
+    def on_spectrum_stream_toggled(self, button):
+        streaming = button.get_active()
+        if streaming == (self.spectrum_stream_id is not None):
+            return
+        msg = {}
+        msg['cmd'] = 'spec_stream'
+        msg['enable'] = streaming
+        msg['topic'] = "calibration/spectrum/live"
+        msg['le_address'] = self.config['solarsim']['address']
+        msg['le_virt'] = self.config['solarsim']['virtual']
+        msg['le_recipe'] = self.b.get_object("light_recipe").get_text()
+        self.commands.send(msg, topic="cmd/uitl")
+        self.spectrum_frames.take()  # forget any stale frame
+        if streaming:
+            lg.info("Streaming spectrum")
+            if self.spectrum_dialog is None:
+                self.spectrum_dialog = self.make_spec_dialog()
+            self.spectrum_dialog.set_title("Solar Sim Spectrum (live)")
+            self.spectrum_dialog.present()
+            self.spectrum_drawing = False
+            self.spectrum_stream_id = GLib.timeout_add(max(int(1000/self.spectrum_fps), 1), self.on_spectrum_frame_tick)
         else:
-            self.spectrum_plot_handle.render_cairo(cairo_context)
-    
-    # takes the spectrum data we got from MQTT and sets it up for plotting
-    def make_spec_svgh(self, spec):
-        x = spec[0]
-        y = spec[1]
-        fig, ax = plt.subplots()  # Create a figure and an axes.
-        fig.subplots_adjust(bottom = 0)
-        fig.subplots_adjust(top = 1)
-        fig.subplots_adjust(right = 1)
-        fig.subplots_adjust(left = 0)
-        ax.plot(x, y, label='Raw Data')  # Plot some data on the axes.
-        ax.set_xlabel('Wavelength [nm]')  # Add an x-label to the axes.
-        ax.set_ylabel('Counts')  # Add a y-label to the axes.
-        ax.grid(True, which="both")
-        #ax.set_title("Solar Sim Spectrum")  # Add a title to the axes.
-
-        #size = fig.get_size_inches()*fig.dpi
-
-        b = BytesIO()
-        #fig.savefig('out.png', bbox_inches='tight',transparent=True, pad_inches=0
-        #fig.tight_layout()
-        size = fig.get_size_inches()*fig.dpi
-        fig.savefig(b, format="svg", transparent=False, bbox_inches='tight', dpi='figure',frameon=True, pad_inches=0)
-        svg_bytes = b.getvalue()
-
-        # make a dialog box to hold the plot
+            lg.info(f"Stopped streaming spectrum ({self.spectrum_frames.dropped} of {self.spectrum_frames.received} frames skipped)")
+            GLib.source_remove(self.spectrum_stream_id)
+            self.spectrum_stream_id = None
+            if self.spectrum_dialog is not None:
+                self.spectrum_dialog.set_title("Solar Sim Spectrum")
+
+    # shows the newest live spectrum frame, at most spectrum_fps times a second
+    # frames that come in while the last one is still waiting to be drawn get skipped
+    def on_spectrum_frame_tick(self):
+        if not self.spectrum_drawing:
+            payload = self.spectrum_frames.take()
+            if payload is not None:
+                m = self.wire.decode("calibration/spectrum/live", payload)
+                if m is not None:
+                    if self.spectrum_time is not None:
+                        self.spectrum_time = None
+                        self.load_spectrum_background()
+                    self.spectrum_plot.set_data(*m['data'][:2])
+                    self.spectrum_drawing = True
+                    self.spectrum_dialog.spec_plot_drawing.queue_draw()
+        return True
+
+    # makes the dialog the spectrum plot is shown in
+    def make_spec_dialog(self):
         dialog_setup = {}
         dialog_setup['title'] = "Solar Sim Spectrum"
         dialog_setup['parent'] = self.main_win
         dialog_setup['destroy_with_parent'] = True
-        dialog_setup['modal'] = True
+        dialog_setup['modal'] = False  # so it can stay up while streaming
         d = Gtk.Dialog(**dialog_setup)
         d.add_buttons(Gtk.STOCK_OK, Gtk.ResponseType.OK)
-        d.connect("close", self.on_spec_dialog_finish)
 
         box = d.get_content_area()
         box.set_border_width(15)
 
         aa = d.get_action_area()
         aa.set_border_width(0)
+        compare = Gtk.SpinButton.new_with_range(0, 50, 1)
+        compare.set_tooltip_text("How many of the previous spectra to show behind this one")
+        compare.connect("value-changed", self.on_spec_compare_changed)
+        aa.pack_start(Gtk.Label(label="Compare with previous:"), False, False, 0)
+        aa.pack_start(compare, False, False, 0)
+        aa.show_all()
         spec_plot_drawing = Gtk.DrawingArea()
         spec_plot_drawing.connect("draw", self.on_spec_plot_draw)
-        
-        svgh = Rsvg.Handle.new_from_data(svg_bytes)
-        self.spectrum_plot_handle = svgh
-        
-        vb = svgh.get_intrinsic_dimensions()
-
-        spec_plot_drawing.props.width_request = size[0]
-        spec_plot_drawing.props.height_request = size[1]
+        spec_plot_drawing.props.width_request = 640
+        spec_plot_drawing.props.height_request = 480
+        spec_plot_drawing.props.expand = True
 
         box.add(spec_plot_drawing)
         d.connect("response", self.on_spec_dialog_finish)
-        d.show_all()
+        d.connect("delete-event", self.on_spec_dialog_finish)
+        box.show_all()
+        d.spec_plot_drawing = spec_plot_drawing
+        d.compare = compare
+        return d
+
+    # takes the spectrum data we got from MQTT and shows it in the spectrum dialog
+    def show_spectrum(self, spec, timestamp=None):
+        self.spectrum_plot.set_data(spec[0], spec[1])
+        if self.spectrum_dialog is None:
+            self.spectrum_dialog = self.make_spec_dialog()
+        if timestamp != self.spectrum_time:
+            self.spectrum_time = timestamp
+            self.load_spectrum_background()
+        self.spectrum_dialog.spec_plot_drawing.queue_draw()
+        self.spectrum_dialog.present()
+        return False
+
+    # puts the spectra from before the one being shown behind it
+    def load_spectrum_background(self):
+        n = self.spectrum_dialog.compare.get_value_as_int()
+        traces = []
+        if (n > 0) and (self.calibration_history is not None):
+            t = math.inf if self.spectrum_time is None else self.spectrum_time
+            traces = [spec[:2] for ts, spec in self.calibration_history.before("spectrum", t, n) if len(spec) >= 2]
+        self.spectrum_plot.set_background(traces)
+
+    # the user changed how many old spectra to compare with
+    def on_spec_compare_changed(self, spin):
+        self.load_spectrum_background()
+        self.spectrum_dialog.spec_plot_drawing.queue_draw()
+
+    # adds a calibration message to the history
+    def store_calibration(self, topic, m):
+        if self.calibration_history is not None:
+            self.calibration_history.append(CalibrationHistory.kind(topic), m['timestamp'], m.get('data'))
 
     def _start_mqtt(self):
         """Start the MQTT client and subscribe to the CLI topic."""
@@ -710,10 +3318,20 @@ class App(Gtk.Application):
 
         def on_message(mqttc, obj, msg):
             """Act on an MQTT message."""
-            try:
-                m = pickle.loads(msg.payload)
-            except:
-                m = None
+            # measurement data for the live plots
+            if msg.topic in self.live_plot_topics:
+                m = self.wire.decode(msg.topic, msg.payload)
+                if m is not None:
+                    self.live_plot_topics[msg.topic].add(m)
+                return
+
+            # live spectrum frames only get decoded if they're going to be drawn
+            if msg.topic == "calibration/spectrum/live":
+                if self.spectrum_stream_id is not None:
+                    self.spectrum_frames.put(msg.payload)
+                return
+
+            m = self.wire.decode(msg.topic, msg.payload)
 
             # examine by message topic
             if m is not None:
@@ -724,24 +3342,47 @@ class App(Gtk.Application):
                     if m == 'Offline' or m == 'Busy':
                         self.b.get_object("run_but").set_sensitive(False)  # prevent multipress
                 elif (msg.topic) == "measurement/log":
-                    lg.log(m["level"], m["msg"])
+                    lg.log(m["level"], m["msg"], extra={'source': "backend"})
                 elif (msg.topic) == "calibration/eqe":
                     self.eqe_cal_time = m['timestamp']
+                    self.store_calibration(msg.topic, m)
                 elif (msg.topic) == "calibration/spectrum":
                     self.iv_cal_time = m['timestamp']
+                    self.store_calibration(msg.topic, m)
                     if self.want_spectrum == True:
                         lg.info("Got a spectrum!")
                         self.want_spectrum = False
                         spec = m['data']
                         # better to do the rest in GLib loop idle, not in the MQTT thread
-                        GLib.idle_add(self.make_spec_svgh, spec)  # this can't be done in the MQTT thread. do it in idle later
+                        GLib.idle_add(self.show_spectrum, spec, m['timestamp'])  # this can't be done in the MQTT thread. do it in idle later
 
                 elif "calibration/psu" in msg.topic:
                     self.psu_cal_time = m['timestamp']
+                    self.store_calibration(msg.topic, m)
+                elif msg.topic == "config/miss":
+                    if m == self.config_hash:
+                        lg.debug("Backend is missing our configuration. Sending it again")
+                        self.published_config_hash = None
+                        self.publish_config()
+                elif msg.topic.startswith("response/"):
+                    self.commands.resolve(msg.topic.split('/', 1)[1], m)
+
+                # pixel status for the array overview, one {'slot': system label, 'pad': pad number, 'state': str and/or 'value': number}
+                # or a list of them, redrawn at most once a frame
+                if isinstance(m, dict) and ('pixel' in m):
+                    pixels = m['pixel'] if isinstance(m['pixel'], list) else [m['pixel']]
+                    schedule = False
+                    for p in pixels:
+                        try:
+                            schedule |= self.pixel_overlay.update(p['slot'], p['pad'], p.get('state'), p.get('value'))
+                        except (KeyError, TypeError, ValueError, AttributeError):
+                            lg.debug(f"Malformed pixel status: {p}")
+                    if schedule:
+                        GLib.timeout_add(33, self.flush_pixel_overlay)
 
                 # examine by message content
                 if 'log' in m:  # log update message
-                    lg.log(m['log']['level'], m['log']['text'])
+                    lg.log(m['log']['level'], m['log']['text'], extra={'source': "backend"})
                 if 'pos' in m:  # position update message
                     pos = m['pos']
                     if len(pos) != self.num_axes:
@@ -777,23 +3418,63 @@ class App(Gtk.Application):
 
             # a channel for results from completed commands
             self.mqttc.subscribe("response/#", qos=2)  
+
+            # the backend asks for a configuration it doesn't have here
+            self.mqttc.subscribe("config/miss", qos=2)
+
+            # measurement data for the live plots
+            for topic in self.live_plot_topics:
+                self.mqttc.subscribe(topic, qos=2)
             self.mqttc.loop_start()
+            self.outbox.client = self.mqttc
+            self.publish_config()
             self.mqtt_setup = True
         except:
             lg.error("Unable to connect to the backend.")
             self.mqtt_setup = False
         self.mqtt_connecting = False
 
+    # publishes the merged configuration as a retained message under its hash, but only if it changed
+    def publish_config(self):
+        if self.published_config_hash != self.config_hash:
+            payload = self.wire.encode(f"config/{self.config_hash}", self.config)
+            if self.outbox.publish(f"config/{self.config_hash}", payload, retain=True, callback=self.on_config_published):
+                self.published_config_hash = self.config_hash
+
+    # allows another try at getting the config out if it failed
+    def on_config_published(self, topic, ok):
+        if ok == False:
+            lg.warning("Failed to publish the configuration")
+            self.published_config_hash = None
+        else:
+            self.clear_old_config(topic)
+
+    # clears the retained message of the config we published last time (if it was different) so they don't pile up on the broker
+    def clear_old_config(self, topic):
+        hash_file = pathlib.Path(GLib.get_user_data_dir()) / "control-ui" / "published_config"
+        try:
+            old_topic = hash_file.read_text().strip()
+        except OSError:
+            old_topic = ""
+        if old_topic not in ["", topic]:
+            lg.debug(f"Clearing the old configuration from {old_topic}")
+            self.outbox.publish(old_topic, b"", retain=True)
+        try:
+            hash_file.parent.mkdir(parents=True, exist_ok=True)
+            hash_file.write_text(topic)
+        except OSError as e:
+            lg.debug(f"Could not remember the published configuration: {e}")
+
     def _stop_mqtt(self):
         """Stop the MQTT client."""
+        self.outbox.client = None
         self.mqttc.loop_stop()
         self.mqttc.disconnect()
 
     def update_measure_count(self, entry):
         parent_frame = entry.get_parent().get_parent()
-        text_is = entry.get_text()
-        selection_bitmask = int(text_is, 16)
-        num_selected = sum([c == "1" for c in bin(selection_bitmask)])
+        store = self.get_store(Gtk.Buildable.get_name(entry))
+        num_selected = store.selection.popcount()
         txt = f'Device Selection Bitmask ({num_selected} selected)'
         parent_frame.set_label(txt)
 
@@ -989,6 +3670,7 @@ class App(Gtk.Application):
         self.slot_config_store = new_store
         #self.slot_config_store.connect('row-changed', self.on_slot_store_change)
         self.slot_config_store.variables = variables
+        self.invalidate_pixel_tables()
 
     # registers a new variable
     # adds the variable name to the variables list
@@ -1011,6 +3693,7 @@ class App(Gtk.Application):
             self.slot_config_store = new_store
             #self.slot_config_store.connect('row-changed', self.on_slot_store_change)
         self.slot_config_store.variables = variables
+        self.invalidate_pixel_tables()
 
         var_cell = Gtk.CellRendererText()
         var_cell.set_property("editable", True)
@@ -1038,24 +3721,31 @@ class App(Gtk.Application):
     # the user has hovered their mouse over a layout choice
     def on_layout_combo_entered(self, widget, event, user_data):
         layout_index = user_data
-        d = self.rotated_layout_drawings[self.layouts[layout_index]]
-        svgh = Rsvg.Handle.new_from_data(d.asSvg().encode())
-        self.layout_drawing_handle = svgh
-        vb = svgh.get_intrinsic_dimensions()
+        self.layout_drawing = self.layout_drawings[self.layouts[layout_index]]
+        surface = self.layout_drawing.surface
 
-        self.subs_pic.props.width_request = vb.out_width.length
-        self.subs_pic.props.height_request = vb.out_height.length
+        self.subs_pic.props.width_request = surface.get_width()
+        self.subs_pic.props.height_request = surface.get_height()
         self.subs_pic.queue_draw()
         self.lopo.popup()
         self.lopo.show_all()
 
     # called when the substrate (lightmask) picture is being drawn
+    # the prerendered picture is used as is unless the screen needs a sharper one
     def on_subs_pic_draw(self, drawing_area, cairo_context):
-        if self.layout_drawing_handle is None:
+        if self.layout_drawing is None:
             drawing_area.queue_draw()
         else:
-            rh = self.layout_drawing_handle
-            rh.render_cairo(cairo_context)
+            scale = drawing_area.get_scale_factor()
+            if scale == 1:
+                surface = self.layout_drawing.surface
+            else:
+                name = f"layout {self.layout_drawing.key}"
+                if name not in self.layout_handles:
+                    self.layout_handles[name] = Rsvg.Handle.new_from_data(self.layout_drawing.svg.encode())
+                surface = self.render_cache.get(name, self.layout_handles[name], scale)
+            cairo_context.set_source_surface(surface, 0, 0)
+            cairo_context.paint()
 
     # the layout ComboBox has now been magically created!
     # so let's install our hover-focus callbacks into its menu widget children
@@ -1081,14 +3771,24 @@ class App(Gtk.Application):
     # called when a user pushes a device selection toggle button
     # updates the store ticked and inconsistent values
     # for this row and all of its children and grandchildren
-    # does not touch parents
+    # and records the change in the store's selection model
+    # parents get sorted out (at most once per frame) by flush_selection
     def on_dev_toggle(self, toggle, path, tree_col):
         store = tree_col.get_tree_view().get_model()
         checked = not toggle.get_active()
         store[path][1] = checked
         store[path][2] = False  # can't be inconsistent
-        GLib.idle_add(self.calc_checkboxes, path, store, checked)
-    
+        self.calc_checkboxes(path, store, checked)
+        indices = Gtk.TreePath(path).get_indices()
+        sel = store.selection
+        if len(indices) == 1:  # the all row
+            sel.set_all(checked)
+        elif len(indices) == 2:  # a substrate row
+            sel.set_slot(indices[1], checked)
+        else:  # a device row
+            sel.set_device(indices[1], indices[2], checked)
+        self.queue_selection_flush(store)
+
     def calc_checkboxes(self, path, store, checked):
         # make this selection flow down to all children and grandchildren
         titer = store.get_iter_from_string(str(path))  # this row's iterator
@@ -1102,8 +3802,75 @@ class App(Gtk.Application):
                 store.set_value(gciter, 2, False)  # can't be inconsistent
                 gciter = store.iter_next(gciter)
             citer = store.iter_next(citer)
-        GLib.idle_add(self.do_dev_store_update_tasks, store)
-        #self.do_dev_store_update_tasks(store)
+
+    # rapid toggles get coalesced into one flush per frame
+    def queue_selection_flush(self, store):
+        if store.flush_pending == False:
+            store.flush_pending = True
+            GLib.timeout_add(16, self.flush_selection, store)
+
+    # brings the parent checkboxes and bitmask text up to date for the slots whose selection changed
+    # and marks the store's pixel dataframe for a rebuild
+    def flush_selection(self, store):
+        store.flush_pending = False
+        sel = store.selection
+        all_row = store.get_iter_first()
+        for subi in sel.dirty:
+            siter = store.iter_nth_child(all_row, subi)
+            self.set_check_state(store, siter, sel.counts[subi], sel.sizes[subi])
+        self.set_check_state(store, all_row, sel.total, sel.n_bits)
+        store.df_stale = True
+        self.get_dev_box(store).set_text(sel.hex_text())
+        self.array_pic.queue_draw()  # the zoomed out array overview shows the selection
+        return False
+
+    # sets a parent row's checkbox given how many of the devices under it are selected
+    def set_check_state(self, store, titer, n_selected, n):
+        if n_selected == 0:
+            store.set_value(titer, 1, False)
+            store.set_value(titer, 2, False)  # set consistent
+        elif n_selected == n:
+            store.set_value(titer, 1, True)
+            store.set_value(titer, 2, False)  # set consistent
+        else:
+            store.set_value(titer, 1, False)
+            store.set_value(titer, 2, True)  # set inconsistent
+
+    # called when the user is done editing (or pasting into) a bitmask text box
+    # loads the bitmask into the matching device store
+    def on_dev_box_edit(self, entry, *args):
+        store = self.get_store(Gtk.Buildable.get_name(entry))
+        sel = store.selection
+        text = entry.get_text()
+        if text != sel.hex_text():
+            try:
+                sel.set_hex(text)
+            except ValueError as e:
+                lg.warning(f"Ignoring invalid device selection bitmask {text}: {e}")
+            else:
+                self.selection_to_tree(store)
+            self.flush_selection(store)  # puts the text back in its normal form
+        return False
+
+    # sets every device row's checkbox from the store's selection model
+    def selection_to_tree(self, store):
+        bits = store.selection.bits
+        b = 0
+        siter = store.iter_children(store.get_iter_first())
+        while siter is not None:
+            diter = store.iter_children(siter)
+            while diter is not None:
+                store.set(diter, 1, bool(bits[b]), 2, False)
+                b += 1
+                diter = store.iter_next(diter)
+            siter = store.iter_next(siter)
+
+    # the bitmask text box that goes with a device store
+    def get_dev_box(self, store):
+        if 'EQE' in store.get_name():
+            return self.eqe_dev_box
+        else:
+            return self.iv_dev_box
 
     # handles keystroke in the label creation tree
     # def handle_label_key(self, tv, event):
@@ -1147,20 +3914,12 @@ class App(Gtk.Application):
     def tick(self, user_data=None):
         # lg.debug("tick")
         if self.mqtt_setup == True:
-            hb = self.b.get_object("headerBar")
-            if self.mqttc.is_connected():
-                status = f"Connected | {self.run_handler_status}"
-                self.mqtt_connected = True
-            else:
-                status = f"Disconnected"
-                self.mqtt_connected = False
-            hb.set_subtitle(f"Status: {status}")
+            self.mqtt_connected = self.mqttc.is_connected()
         else:
             self.mqtt_connected = False
-            status = "Disconnected"
-            self.b.get_object("headerBar").set_subtitle(f"Status: {status}")
             if self.mqtt_connecting == False:  # don't spam connections
                 self._start_mqtt()
+        self.update_status_subtitle()
         if self.eqe_cal_time is None:
             human_dt = 'No record'
         else:
@@ -1181,6 +3940,49 @@ class App(Gtk.Application):
         rns.set_text(str(now))
         return True
 
+    # shows the connection state, backend state and the number of in-flight commands in the header bar
+    def update_status_subtitle(self):
+        if self.mqtt_connected == True:
+            status = f"Connected | {self.run_handler_status}"
+        else:
+            status = "Disconnected"
+        n = self.outbox.in_flight
+        if n > 0:
+            status += f" | {n} in flight"
+        self.b.get_object("headerBar").set_subtitle(f"Status: {status}")
+
+    # builds the table showing command round trip times on the maintenance page
+    def setup_latency_view(self):
+        # [str, int, str, str, str, int] is for [command, replies, last, mean, max, timeouts]
+        self.latency_store = Gtk.ListStore(str, int, str, str, str, int)
+        self.latency_rows = {}  # command name --> row reference
+        tv = Gtk.TreeView(model=self.latency_store)
+        for i, title in enumerate(["Command", "Replies", "Last [ms]", "Mean [ms]", "Max [ms]", "Timeouts"]):
+            tv.append_column(Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=i))
+        frame = Gtk.Frame(label="Command Round Trips")
+        frame.add(tv)
+        fbc = Gtk.FlowBoxChild()
+        fbc.add(frame)
+        fbc.show_all()
+        self.b.get_object("util_flowbox").add(fbc)
+
+    # called by the command tracker after a round trip or a timeout
+    def on_command_latency(self, cmd, stats):
+        if stats['n'] > 0:
+            cols = [f"{stats['last']*1000:.0f}", f"{stats['total']/stats['n']*1000:.0f}", f"{stats['max']*1000:.0f}"]
+        else:
+            cols = ['', '', '']
+        row = [cmd, stats['n']] + cols + [stats['timeouts']]
+        if cmd in self.latency_rows:
+            self.latency_store[self.latency_rows[cmd].get_path()] = row
+        else:
+            titer = self.latency_store.append(row)
+            self.latency_rows[cmd] = Gtk.TreeRowReference.new(self.latency_store, self.latency_store.get_path(titer))
+
+    # called by the outbound publisher when its in-flight count changes
+    def on_in_flight_change(self, n):
+        self.update_status_subtitle()
+
     # a function that blocks non-alphanumeric text entry
     def only_alnum(self, widget, text, text_len, text_pos):
         if text_len > 0:
@@ -1211,183 +4013,324 @@ class App(Gtk.Application):
         rn.set_text(run_name)
 
     # draws the whole slot array
-    def draw_array(self):
-        max_render_pix = 600  # the picture's largest dim will be this many pixels
+    # this is only done when the slot config or rotation angle has changed since the last time
+    def draw_array(self, force=False):
+        angle = self.config['UI']['gui_drawing_rotation_angle']
+        if (force == False) and (self.array_dirty == False) and (angle == self.array_drawing_angle):
+            return
+        max_render_pix = 600  # used to size the labels relative to the array
+        big_font_size = max_render_pix/25
         dim = len(self.spacings)
-        unit = self.spacings
+        unit = list(self.spacings)
         if dim == 1:
             unit = unit*2
         elif dim == 3:
             del(unit[-1])
-        
-        # size the canvas
-        canvas = [0, 0]
-        x_cens = [pos[0] for lab, pos in self.substrate_locations.items()]
-        canvas[0] = max(x_cens) - min(x_cens) + unit[0]
+
+        labels = [row[0] for row in self.slot_config_store]
+        layouts = [row[2] for row in self.slot_config_store]
+        pos = self.substrate_locations.take(labels)
         if dim == 1:
-            canvas[1] = unit[1]
+            centers = np.column_stack([pos[:, 0], np.zeros(len(pos))])
         else:
-            y_cens = [pos[1] for lab, pos in self.substrate_locations.items()]
-            canvas[1] = max(y_cens) - min(y_cens) + unit[1]
-
-        d = draw.Drawing(canvas[0], canvas[1], origin='center', displayInline=False, **{'text-align':'center', 'font-family': 'monospace'})
-        #d = draw.Drawing(max(canvas), max(canvas), origin='center', displayInline=False)
-        #cmax = max(canvas)
-
-
-        # try to see if we can hyperlink the background...
-        # TODO: does not work atm, remove if this can't be fixed
-        #class Hyperlink(draw.DrawingParentElement):
-        #    TAG_NAME = 'a'
-        #    def __init__(self, href, target=None, **kwargs):
-        #        super().__init__(href=href, target=target, **kwargs)
-        
-        #hlink = Hyperlink('https://www.python.org', target='_blank')
-        #hlink.append(draw.Rectangle(-canvas[0]/2, -canvas[1]/2, canvas[0], canvas[1], fill='white'))
-        #d.append(hlink)
-        #rh = self.array_drawing_handle
-        #angle = self.config['UI']['gui_drawing_rotation_angle']
-        #cairo_context.rotate(math.pi*angle/180)
-        #rh.render_cairo(cairo_context)
-        #print(rh.get_geometry_for_element(None)[-1].width)
-        angle = self.config['UI']['gui_drawing_rotation_angle']
-        rot = f"rotate({angle},0,0)"
-        rg = draw.Group(**{"transform":rot})
-
-        for row in self.slot_config_store:
-            label = row[0]
-            layout = row[2]
-            pos = self.substrate_locations[label]
-            lod = self.layout_drawings[layout]
-            if dim == 1:
-                t2 = f"translate({pos[0]},0)"
-            else:
-                t2 = f"translate({pos[0]},{pos[1]})"
-            g = draw.Group(**{"transform":t2})
-            for e in lod.allElements():
-                g.append(e)
-            big_font_size = max_render_pix/25
-            lab = draw.Text(label, big_font_size, 0, -big_font_size/3, fill='lime', fill_opacity=0.9, **{'text-anchor':'middle','dominant-baseline':'central', 'font-weight':"bold"})  # , "transform":urot
-            g.append(lab)
-            #if not '1A' in label:
-            #    d.append(g)
-            rg.append(g)
-            #d.append(g)
-        d.append(rg)
-
-        #maxd = max(canvas)
-        #scale = max_render_pix/maxd
-        #d.setPixelScale(scale)
-        svg_handle = Rsvg.Handle.new_from_data(d.asSvg().encode())
-        vb = svg_handle.get_intrinsic_dimensions().out_viewbox
-        r = svg_handle.get_geometry_for_layer(None, vb).out_ink_rect
-        vb_new = (r.x, r.y, r.width, r.height)
-        d.viewBox = vb_new
-        d.width = r.width
-        d.height = r.height
-        ndims = [r.width, r.height]
-        scale = max_render_pix/max(ndims)
-        d.setPixelScale(scale)
-        svg_handle = Rsvg.Handle.new_from_data(d.asSvg().encode())
-
-        self.array_drawing_handle = svg_handle
-
-        self.array_pic.props.width_request = ndims[0]*scale
-        self.array_pic.props.height_request = ndims[1]*scale
-    
+            centers = pos[:, :2]
+
+        # the drawing's extent is known without having to render it
+        label_widths = np.array([len(label) for label in labels]) * big_font_size * 0.6  # monospace bold glyphs are about 0.6 em wide
+        vb = array_view_box(centers, unit, angle, label_widths, big_font_size)
+        layout_bodies = {layout: self.layout_drawings[layout].body for layout in set(layouts)}
+        d = compose_array_drawing(labels, layouts, centers, layout_bodies, angle, big_font_size, vb)
+
+        # one svg unit per pixel, ArrayView does the scaling
+        self.array_drawing_handle = Rsvg.Handle.new_from_data(d.asSvg().encode())
+        self.render_cache.invalidate("array")
+        self.array_dirty = False
+        self.array_drawing_angle = angle
+
+        self.array_index = ArrayIndex(centers, unit, layouts, self.pixel_geometry, labels)
+        self.pixel_overlay.bind(self.array_index)
+        view = ArrayView(centers, unit, angle, labels, vb)
+        old = self.array_view
+        if (old is not None) and (old.view_box == vb):  # keep the user's zoom and pan
+            view.size, view.fit_zoom, view.level, view.pan = old.size, old.fit_zoom, old.level, old.pan
+        self.array_view = view
+        self.array_pic.queue_draw()
+
+    # the array overview: plain slot boxes colored by selection when zoomed out, the full drawing in tiles when zoomed in
     def on_array_pic_draw(self, drawing_area, cairo_context):
-        if self.array_drawing_handle is None:
-            drawing_area.queue_draw()
+        view = self.array_view
+        if view is None:
+            return
+        width = drawing_area.get_allocated_width()
+        height = drawing_area.get_allocated_height()
+        if (view.size is None) or ((view.size != (width, height)) and (view.level == 0)):
+            view.fit(width, height)
+        if view.detailed():
+            scale = drawing_area.get_scale_factor()
+            t = view.tile_size
+            cairo_context.set_source_rgb(1, 1, 1)
+            cairo_context.paint()
+            for tx, ty, x, y in view.visible_tiles(width, height):
+                key = ("array", "tile", view.zoom, tx, ty, scale)
+                surface = self.render_cache.fetch(key, t, t, scale, lambda cr: view.render_tile(cr, self.array_drawing_handle, tx, ty))
+                cairo_context.set_source_surface(surface, x, y)
+                cairo_context.paint()
         else:
-            rh = self.array_drawing_handle
-            #angle = self.config['UI']['gui_drawing_rotation_angle']
-            #cairo_context.rotate(math.pi*angle/180)
-            rh.render_cairo(cairo_context)
-
-    # draws pixels based on layout info from the config file
-    def draw_layout(self, pads, areas, locations, shapes, size, spacing, name):
-        max_render_pix = 300  # how big in pixels should the canvas be on screen?
-        d = len(spacing)
-        canvas = spacing
-        if d == 1:
-            canvas = canvas*2
-        elif d == 3:
-            del(canvas[-1])
-        maxd = max(canvas)
-        scale = max_render_pix/maxd
-
-        d  = draw.Drawing(canvas[0], canvas[1], origin='center', displayInline=False, **{'text-align':'center', 'font-family': 'monospace'})
-        dr = draw.Drawing(canvas[0], canvas[1], origin='center', displayInline=False, **{'text-align':'center', 'font-family': 'monospace'})
-        angle = self.config['UI']['gui_drawing_rotation_angle']
+            fills, outlines = self.slot_colors()
+            view.draw_simple(cairo_context, fills, outlines)
+        view.draw_overlay(cairo_context, self.array_index, self.pixel_overlay.colors)
+        if self.array_lasso is not None:
+            cairo_context.move_to(*self.array_lasso[0])
+            for x, y in self.array_lasso[1:]:
+                cairo_context.line_to(x, y)
+            cairo_context.close_path()
+            cairo_context.set_source_rgba(0.1, 0.3, 0.9, 0.15)
+            cairo_context.fill_preserve()
+            cairo_context.set_source_rgba(0.1, 0.3, 0.9, 0.8)
+            cairo_context.set_line_width(1.5)
+            cairo_context.stroke()
+
+    # applies the pixel status updates that came in since the last frame
+    # and asks gtk to redraw just the pixels that changed
+    def flush_pixel_overlay(self):
+        changed = self.pixel_overlay.take()
+        if self.array_view is not None:
+            if (changed is None) or (len(changed) > 500):
+                self.array_pic.queue_draw()
+            else:
+                for i in changed:
+                    self.array_pic.queue_draw_area(*self.array_view.pixel_screen_box(self.array_index, i))
+        return False
+
+    # rgba fill and outline colors for each slot in the array overview's low detail mode:
+    # the fill shows the I-V selection (gray none, amber some, green all) and a blue outline means EQE devices are selected
+    def slot_colors(self):
+        iv = self.iv_store.selection
+        eqe = self.eqe_store.selection
+        fills = np.tile([0.75, 0.75, 0.75, 1.0], (len(iv.sizes), 1))
+        fills[iv.counts > 0] = [0.95, 0.7, 0.2, 1.0]
+        fills[(iv.counts == iv.sizes) & (iv.sizes > 0)] = [0.3, 0.75, 0.3, 1.0]
+        fills[iv.sizes == 0] = [0.3, 0.3, 0.3, 1.0]
+        outlines = np.zeros((len(eqe.sizes), 4))
+        outlines[eqe.counts > 0] = [0.1, 0.3, 0.9, 1.0]
+        return fills, outlines
+
+    # scroll to zoom the array overview around the mouse
+    def on_array_pic_scroll(self, widget, event):
+        if self.array_view is not None:
+            if event.direction == Gdk.ScrollDirection.UP:
+                steps = 1
+            elif event.direction == Gdk.ScrollDirection.DOWN:
+                steps = -1
+            elif event.direction == Gdk.ScrollDirection.SMOOTH:
+                self.array_view.scroll_accum -= event.delta_y
+                steps = int(self.array_view.scroll_accum)
+                self.array_view.scroll_accum -= steps
+            else:
+                steps = 0
+            if steps != 0:
+                self.array_view.zoom_at(steps, event.x, event.y)
+                widget.queue_draw()
+        return True
+
+    # middle or right drag pans the array overview, double click zooms back out to fit it all
+    # left click toggles the I-V selection of the device (or whole slot when zoomed out or between devices) under the mouse
+    # left drag lassos devices to select (or deselect with shift held)
+    # control held makes clicks and lassos work on the EQE selection instead
+    def on_array_pic_press(self, widget, event):
+        if self.array_view is not None:
+            if (event.type == Gdk.EventType._2BUTTON_PRESS) and (event.button == 1):
+                # the first click of a double click shouldn't change the selection and neither should this one
+                if self.array_click is not None:
+                    GLib.source_remove(self.array_click[0])
+                    self.array_click = None
+                self.array_lasso = None
+                self.array_double_clicked = True
+                self.array_view.fit(widget.get_allocated_width(), widget.get_allocated_height())
+                widget.queue_draw()
+            elif (event.type == Gdk.EventType.BUTTON_PRESS) and (event.button == 1):
+                self.array_lasso = [(event.x, event.y)]
+            elif event.button in [2, 3]:
+                self.array_drag = (event.x, event.y)
+        return True
 
-        n_pads = len(pads)
+    def on_array_pic_motion(self, widget, event):
+        if (self.array_drag is not None) and (self.array_view is not None):
+            self.array_view.pan_by(event.x - self.array_drag[0], event.y - self.array_drag[1])
+            self.array_drag = (event.x, event.y)
+            widget.queue_draw()
+        elif self.array_lasso is not None:
+            last = self.array_lasso[-1]
+            if abs(event.x - last[0]) + abs(event.y - last[1]) > 2:
+                self.array_lasso.append((event.x, event.y))
+                widget.queue_draw()
+        return True
 
-        wbg = draw.Rectangle(-canvas[0]/2, -canvas[1]/2, canvas[0], canvas[1], fill='white')
-        d.append(wbg)
+    def on_array_pic_release(self, widget, event):
+        self.array_drag = None
+        lasso = self.array_lasso
+        self.array_lasso = None
+        if (event.button == 1) and self.array_double_clicked:
+            self.array_double_clicked = False
+        elif (event.button == 1) and (lasso is not None) and (self.array_index is not None):
+            if event.state & Gdk.ModifierType.CONTROL_MASK:
+                store = self.eqe_store
+            else:
+                store = self.iv_store
+            points = np.array(lasso, dtype=np.float64)
+            if len(points) < 3 or np.ptp(points, axis=0).max() < 5:  # a click
+                x, y = self.array_view.screen_to_slot(event.x, event.y)
+                hit = self.array_index.hit(x, y, pixels=self.array_view.detailed())
+                if hit is not None:
+                    # wait until it can't be the start of a double click anymore
+                    self.flush_array_click()
+                    wait = Gtk.Settings.get_default().props.gtk_double_click_time
+                    args = (store, widget) + tuple(hit)
+                    self.array_click = (GLib.timeout_add(wait, self.on_array_click, *args), args)
+            else:
+                self.flush_array_click()
+                x, y = self.array_view.screen_to_slot(points[:, 0], points[:, 1])
+                subi, pixi = self.array_index.lasso(np.column_stack([x, y]))
+                self.set_device_selection(store, subi, pixi, not (event.state & Gdk.ModifierType.SHIFT_MASK))
+            widget.queue_draw()
+        return True
 
-        if n_pads > 0:  # handles the empty case
-            bg = draw.Rectangle(-size[0]/2, -size[1]/2, size[0], size[1], fill='black')
-            d.append(bg)
+    # toggles the selection of the device or slot that was clicked on the array overview
+    def on_array_click(self, store, widget, subi, pixi):
+        self.array_click = None
+        sel = store.selection
+        if pixi is None:
+            self.set_slot_selection(store, subi, sel.counts[subi] < sel.sizes[subi])
+        else:
+            self.set_device_selection(store, [subi], [pixi], not sel.is_set(int(sel.bit_of(subi, pixi))))
+        widget.queue_draw()
+        return False
+
+    # applies a click on the array overview that's still waiting on the double click time right away
+    def flush_array_click(self):
+        if self.array_click is not None:
+            source, args = self.array_click
+            GLib.source_remove(source)
+            self.on_array_click(*args)
+
+    # selects or deselects devices in a device store the same way ticking their boxes in the device picker would
+    def set_device_selection(self, store, subi, pixi, checked):
+        sel = store.selection
+        for si, pi in zip(subi, pixi):
+            sel.set_device(int(si), int(pi), checked)
+            diter = store.get_iter(Gtk.TreePath.new_from_indices([0, int(si), int(pi)]))
+            store.set(diter, 1, checked, 2, False)
+        self.queue_selection_flush(store)
+
+    # selects or deselects a whole slot in a device store
+    def set_slot_selection(self, store, subi, checked):
+        path = Gtk.TreePath.new_from_indices([0, subi])
+        store[path][1] = checked
+        store[path][2] = False
+        self.calc_checkboxes(path, store, checked)
+        store.selection.set_slot(subi, checked)
+        self.queue_selection_flush(store)
 
-        for i in range(n_pads):
-            pad = pads[i]
-            a = areas[i] * 100  # cm^2 to mm^2
-            xy = locations[i]
-            shape = shapes[i]
-            if shape == 'c':
-                r = math.sqrt(a/math.pi)
-                d.append(draw.Circle(xy[0], xy[1], r, fill='white'))
-            elif shape == 's':
-                rx = math.sqrt(a)
-                d.append(draw.Rectangle(xy[0]-rx/2, xy[1]-rx/2, rx, rx, fill='white'))
-            elif isinstance(shape, float):
-                rx = shape
-                ry = a/rx
-                d.append(draw.Rectangle(xy[0]-rx/2, xy[1]-ry/2, rx, ry, fill='white'))
-            lab_font_size = scale/3
-            lx = xy[0]
-            ly = xy[1]-lab_font_size/3
-            #urot = f"rotate({-angle},{lx},{ly})"
-            lab = draw.Text(str(pad), lab_font_size, lx, ly, fill='gray', **{'text-anchor':'middle','dominant-baseline':'central', 'font-weight':"bold"})  # , "transform":urot
-            d.append(lab)
-        if ('OLD' in name) or ('legacy' in name):
-            ll = maxd/4
-            x1 = draw.Line(ll, ll, -ll, -ll, **{'stroke-width':f"{ll/8}","stroke":"red"})
-            d.append(x1)
-            x2 = draw.Line(ll, -ll, -ll, ll, **{'stroke-width':f"{ll/8}","stroke":"red"})
-            d.append(x2)
-
-        d.setPixelScale(scale)
-
-        # now for the rotated version of this
-        rot = f"rotate({angle},0,0)"
-        g = draw.Group(**{"transform":rot})
-        for e in d.allElements():
-            g.append(e)
-        dr.append(g)
-        dr.setPixelScale(scale)
-
-        return d, dr
-
-    def load_live_data_webviews(self, load):
-        for i,wvid in enumerate(self.wvids):
+    # puts native plots in place of the live data webviews
+    def make_live_plots(self):
+        try:
+            overrides = self.config['UI']['live_plots']
+        except:
+            overrides = {}
+        try:
+            self.plot_fps = self.config['UI']['live_plot_fps']
+        except:
+            pass
+        try:
+            capacity = self.config['UI']['live_plot_points']
+        except:
+            capacity = 4096
+        try:
+            max_traces = self.config['UI']['live_plot_traces']
+        except:
+            max_traces = 10
+
+        for wvid in self.wvids:
+            name = wvid[:-len("_wv")]
+            spec = dict(LivePlot.presets[name])
+            spec.update(overrides.get(name) or {})
+            topic = spec.pop('topic')
+            plot = LivePlot(**spec, capacity=capacity, max_traces=max_traces)
+            area = Gtk.DrawingArea()
+            area.connect("draw", self.on_live_plot_draw, plot)
+            area.props.expand = True
+
+            # the plot goes exactly where the webview was
             wv = self.b.get_object(wvid)
-            if wv.get_visible() == True:
-                wv.stop_loading()
-                if load == True:
-                    wv.load_uri(self.uris[i])
-                else:
-                    wv.load_html("Inactive.")
-
-    # must only get called if this tab is visible
-    def load_custom_webview(self, load):
-        wv = self.b.get_object("custom_wv")
-        if wv.get_visible() == True:
-            wv.stop_loading()
-            if load == True:
-                wv.load_uri(self.uris[-1])  # should always be the last webview and uri
-            else:
-                wv.load_html("Inactive.")
+            parent = wv.get_parent()
+            packing = {p.name: parent.child_get_property(wv, p.name) for p in type(parent).list_child_properties()}
+            area.set_visible(wv.get_visible())
+            parent.remove(wv)
+            wv.destroy()
+            parent.add(area)
+            for prop, value in packing.items():
+                parent.child_set_property(area, prop, value)
+            self.live_plots[name] = (plot, area)
+            self.live_plot_topics[topic] = plot
+            self.plot_widgets[name] = area
+
+        GLib.timeout_add(max(int(1000/self.plot_fps), 1), self.on_live_plot_tick)
+
+    # redraws the live plots that got new data, each at most as often as its rate allows
+    def on_live_plot_tick(self):
+        now = time.monotonic()
+        for name, (plot, area) in self.live_plots.items():
+            rate = self.plot_rates.get(name, self.plot_fps)
+            if (rate > 0) and (now - self.live_plot_drawn.get(name, -math.inf) >= 1/rate - 0.01):
+                if plot.take_changed():
+                    area.queue_draw()
+                    self.live_plot_drawn[name] = now
+        return True
+
+    # the update rate for each plot: live_plot_fps if it can be seen, plot_idle_rate if it can be seen
+    # but the window doesn't have focus, and 0 if it's on a hidden page, minimized or paused by the user
+    def find_plot_rates(self):
+        ms = self.b.get_object('mainStack')
+        page_shown = ms.child_get_property(ms.get_visible_child(), 'title') == 'Live Data'
+        rate = self.plot_fps if self.main_win.is_active() else self.plot_idle_rate
+        rates = {}
+        for name, widget in self.plot_widgets.items():
+            seen = page_shown and self.window_shown and (not self.live_plots_paused) and widget.get_visible()
+            rates[name] = rate if seen else 0
+        return rates
+
+    # tells the plotter which plots need drawing and how often, when that changes
+    # plots we draw ourselves don't need the plotter at all
+    def update_plot_rates(self, force=False):
+        rates = self.find_plot_rates()
+        for name, rate in rates.items():
+            served_rate = 0 if name in self.live_plots else rate
+            if force or (served_rate != self.plot_rates.get(name)) and (name not in self.live_plots):
+                self.outbox.publish(f"plotter/pause/{name}", self.wire.encode(f"plotter/pause/{name}", served_rate == 0))
+                self.outbox.publish(f"plotter/rate/{name}", self.wire.encode(f"plotter/rate/{name}", served_rate))
+        self.plot_rates = rates
+
+    # the main window got minimized or restored
+    def on_main_window_state(self, window, event):
+        self.window_shown = not (event.new_window_state & (Gdk.WindowState.ICONIFIED | Gdk.WindowState.WITHDRAWN))
+        self.update_plot_rates()
+        return False
+
+    # the main window gained or lost focus
+    def on_main_window_active(self, window, pspec):
+        self.update_plot_rates()
+
+    # handles rendering of a live plot
+    def on_live_plot_draw(self, area, cairo_context, plot):
+        plot.draw(cairo_context, area.get_allocated_width(), area.get_allocated_height())
+
+    # applies the invert voltage/current switches to the live plots
+    def set_live_plot_signs(self):
+        flip = {0: -1 if self.invert_voltage else 1, 1: -1 if self.invert_current else 1}
+        flip["power"] = flip[0]*flip[1]
+        for plot, area in self.live_plots.values():
+            plot.signs = (flip.get(plot.x, 1), flip.get(plot.y, 1))
+            area.queue_draw()
 
     # gets called when the user selects a custom position
     def on_load_pos(self, cb):
@@ -1401,6 +4344,7 @@ class App(Gtk.Application):
         system_label = store[iter][0]
         user_label = store[iter][1]
         layout = store[iter][2]
+        self.invalidate_pixel_tables()  # labels and variables are in the pixel dataframes
 
         try:
             pads  = self.config['substrates']['layouts'][layout]['pads']
@@ -1423,6 +4367,7 @@ class App(Gtk.Application):
                     display_label = system_label
                 store.set_value(slot_iter, 0, display_label)
             elif col == 0:  # this was a layout change
+                self.array_dirty = True
                 subs_check_visible = n_pix > 0
                 store.set_value(slot_iter, 3, layout)
                 store.set_value(slot_iter, 4, subs_check_visible)
@@ -1456,45 +4401,23 @@ class App(Gtk.Application):
             #self.do_dev_store_update_tasks(store)
 
     # this function does the things that need to be done when something about a device store has changed
-    # such as areas changed, pixels added to or removed from substrate, user label change or device selection change 
+    # such as areas changed, pixels added to or removed from substrate or user label change
+    # (plain selection changes go through the cheaper on_dev_toggle -> flush_selection path)
     # it
     # - ensures the device store ckeckbox booleans make sense.
     # by potentially modifying [2] incosistent, [4] visible  and [1] selected values for the top and substrate rows
     # - won't ever modify device row selections
+    # - rebuilds the store's selection model from the tree
     # - fills the bitmask text field
-    # - writes the dev selection string
-    # - computes the device dataframe containing relevant info on every device selected for measurement
+    # - marks the device dataframe for a rebuild (see get_pixel_table)
     def do_dev_store_update_tasks(self, store):
         all_row = store.get_iter_first()  # the all row iterator
         siter = store.iter_children(all_row)  # the substrate iterator
-        n_total = 0
-        n_total_selected = 0
-        bitmask = 0
-        bitloc = 0
-        
-        df_cols=[]
-        df_cols.append('system_label')  # label for the substrate slot that the system uses
-        df_cols.append('user_label')  # label the user may have entered for this substrate
-        df_cols.append('label')  # combo of the above two, formated as "{system}_{user}"
-        df_cols.append('substrate_index')  # a number used to represent the substrate
-        df_cols.append('layout_pixel_index')  # pixel index is for which pixel this is on its layout
-        df_cols.append('pixel_offset_raw')  # offset of this pixel relative to the center of its substrate (as read from the config file)
-        df_cols.append('pixel_offset')  # offset of this pixel relative to the center of its substrate (with unconfigured axes trimmed)
-        df_cols.append('substrate_offset_raw')  # offset of this substrate in the array
-        df_cols.append('substrate_offset')  # offset of this substrate in the array (with unconfigured axes trimmed)
-        df_cols.append('loc_raw')  # offset of this pixel from center of substrate array
-        df_cols.append('loc')  # offset of this pixel from center of substrate array  (with unconfigured axes trimmed)
-        df_cols.append('layout')  # the layout name
-        df_cols.append('area')  # illuminated area in cm^2
-        df_cols.append('dark_area')  # active area in cm^2
-        df_cols.append('mux_index')  # mux index is which mux switch needs to be closed for this (same as "pad" in cofig file)
-        df_cols.append('mux_string')  # the string the firmware needs to select this pixel
-        df_cols.append('user_vars')  # dictionary for the user variables
-        df_cols += self.slot_config_store.variables  # experimental variable names
-        df = pd.DataFrame(columns=df_cols)
+        slot_sizes = []
+        checks = []  # selection state of every device, in bitmask order
         while siter is not None:  # substrate iterator loop
             n_subs = store.iter_n_children(siter)
-            n_total += n_subs
+            slot_sizes.append(n_subs)
 
             # set substrate level box visibility
             if n_subs == 0:
@@ -1503,125 +4426,54 @@ class App(Gtk.Application):
             else:
                 store.set_value(siter, 4, True)
             diter = store.iter_children(siter)  # the device iterator
-            n_subs_selected = 0
             while diter is not None:  # device iterator loop
-                if store[diter][1] == True:  # device selected
-                    bitmask += (1 << bitloc)
-
-                    dfr = n_total_selected + n_subs_selected  # dataframe row
-                    df.append(pd.Series(name=dfr, dtype=object))
-                    dpath = str(store.get_path(diter))
-                    dpath_split = dpath.split(':')
-                    pixi = int(dpath_split[2])  # pixel index in tree
-                    subi = int(dpath_split[1])  # substrate index in tree
-                    system_label = self.slot_config_store[subi][0]
-                    user_label = self.slot_config_store[subi][1]
-                    layout = self.slot_config_store[subi][2]
-                    df.at[dfr, 'layout_pixel_index'] = pixi
-                    df.at[dfr, 'substrate_index'] = subi
-                    df.at[dfr, 'system_label'] = system_label
-                    df.at[dfr, 'user_label'] = user_label
-                    if user_label == "":
-                        df.at[dfr, 'label'] = system_label
-                    else:
-                        df.at[dfr, 'label'] = f"{system_label}_{user_label}"
-                    df.at[dfr, 'layout'] = layout
-                    df.at[dfr, 'area'] = self.config['substrates']['layouts'][layout]['areas'][pixi]
-                    df.at[dfr, 'dark_area'] = self.config['substrates']['layouts'][layout]['dark_areas'][pixi]
-                    mux_index = self.config['substrates']['layouts'][layout]['pads'][pixi]
-                    df.at[dfr, 'mux_index'] = mux_index
-                    df.at[dfr, 'mux_string'] = f"s{system_label}{mux_index}"
-                    # the stage movements need to be reversed from the physical location offsets, so all
-                    # these offset numbers get multiplied by -1 before getting stored in the output dataframe
-                    por = self.config['substrates']['layouts'][layout]['locations'][pixi]
-                    por = [p*-1 for p in por]
-                    df.at[dfr, 'pixel_offset_raw'] = por
-                    sor = self.substrate_locations[system_label]
-                    sor = [s*-1 for s in sor]
-                    df.at[dfr, 'substrate_offset_raw'] = sor
-                    locr = []
-                    for s,p in zip(sor,por):
-                        locr.append(s+p)
-                    df.at[dfr, 'loc_raw'] = locr
-                    if self.num_axes < 3:
-                        try:
-                            del por[2]
-                            del sor[2]
-                            del locr[2]
-                        except:
-                            pass
-                    if self.num_axes < 2:
-                        try:
-                            del por[1]
-                            del sor[1]
-                            del locr[1]
-                        except:
-                            pass
-                    if self.num_axes < 1:
-                        try:
-                            del por[0]
-                            del sor[0]
-                            del locr[0]
-                        except:
-                            pass
-                    df.at[dfr, 'pixel_offset'] = por
-                    df.at[dfr, 'substrate_offset'] = sor
-                    df.at[dfr, 'loc'] = locr
-                    user_vars = {}
-                    for i,var in enumerate(self.slot_config_store.variables):
-                        df.at[dfr, var] = self.slot_config_store[subi][3+i]
-                        user_vars[var] = self.slot_config_store[subi][3+i]
-                    df.at[dfr, 'user_vars'] = user_vars
-
-                    n_subs_selected += 1
-
-                bitloc += 1
+                checks.append(store[diter][1] == True)
                 diter = store.iter_next(diter)
-            n_total_selected += n_subs_selected
-
-            # set substrate level box state
-            if n_subs_selected == 0:
-                store.set_value(siter, 1, False)
-                store.set_value(siter, 2, False)  # set consistent
-            elif n_subs_selected == n_subs:
-                store.set_value(siter, 1, True)
-                store.set_value(siter, 2, False)  # set consistent
-            else:
-                store.set_value(siter, 1, False)
-                store.set_value(siter, 2, True)  # set inconsistent
-
             siter = store.iter_next(siter)
 
-        # set gui's hex text
-        fmt_str = f"0{math.ceil(bitloc/4)}X"
-        bitmask_text = f"0x{bitmask:{fmt_str}}"
-        store_name = store.get_name()
-        df.index.name = store_name.split()[0]
-        if 'IV' in store_name:
-            self.iv_dev_box.set_text(bitmask_text)
-        elif 'EQE' in store_name:
-            self.eqe_dev_box.set_text(bitmask_text)
-
-        # attach the active pixel dataframe we just made to this store
-        store.df = df
+        sel = DeviceSelection(slot_sizes)
+        sel.set_bits(checks)
+        store.selection = sel
+        store.flush_pending = False
 
         # set top level box visiblility
-        if n_total == 0:
+        if sel.n_bits == 0:
             # top level picker is invisible
             store.set_value(all_row, 4, False)
         else:
             store.set_value(all_row, 4, True)
 
-        # set top level checkbox state
-        if n_total_selected == 0:
-            store.set_value(all_row, 1, False)
-            store.set_value(all_row, 2, False)  # set consistent
-        elif n_total_selected == n_total:
-            store.set_value(all_row, 1, True)
-            store.set_value(all_row, 2, False)  # set consistent
-        else:
-            store.set_value(all_row, 1, False)
-            store.set_value(all_row, 2, True)  # set inconsistent
+        # set the substrate and top level checkbox states and the gui's hex text
+        self.flush_selection(store)
+
+    # the dataframe containing relevant info on every device selected for measurement in a store
+    # only built when something asks for it, not on every selection change
+    def get_pixel_table(self, store):
+        if store.df_stale == True:
+            subi, pixi = store.selection.selected()
+            df = self.pixel_geometry.pixel_table(subi, pixi, self.slot_table(), self.num_axes, self.slot_config_store.variables)
+            df.index.name = store.get_name().split()[0]
+            store.df = df
+            store.df_stale = False
+        return store.df
+
+    # the pixel dataframes depend on the slot config too
+    def invalidate_pixel_tables(self):
+        for store_name in ['iv_store', 'eqe_store']:
+            if hasattr(self, store_name):
+                getattr(self, store_name).df_stale = True
+
+    # per slot info from the slot configuration store, in the shape PixelGeometry.pixel_table wants it
+    def slot_table(self):
+        n_vars = len(self.slot_config_store.variables)
+        slots = {'system_label': [], 'user_label': [], 'layout': [], 'vars': []}
+        for row in self.slot_config_store:
+            slots['system_label'].append(row[0])
+            slots['user_label'].append(row[1])
+            slots['layout'].append(row[2])
+            slots['vars'].append([row[3+i] for i in range(n_vars)])
+        slots['position'] = self.substrate_locations.take(slots['system_label'])
+        return slots
 
     def do_command_line(self, command_line):
         lg.debug("Doing command line things")
@@ -1640,17 +4492,13 @@ class App(Gtk.Application):
             lg.debug(f'Config file given on command line: {conf}')
             self.cl_config = pathlib.Path(conf)
 
+        if "benchmark" in options:
+            run_benchmarks()
+            return 0
+
         self.activate()
         return 0
 
-    # adds text, then scrolls the log window to the bottom
-    # (called from GLib.idle_add or else segfault!)
-    def append_to_log_window(self, text):
-        ei = self.logTB.get_end_iter()
-        self.logTB.insert(ei, text)
-        adj = self.log_win_adj
-        adj.set_value(adj.get_upper())
-
     def on_about(self, action, param):
         about_dialog = Gtk.AboutDialog(transient_for=self.main_win, modal=True)
         about_dialog.run()
@@ -1659,14 +4507,18 @@ class App(Gtk.Application):
         # stop the ticker
         GLib.source_remove(self.ticker_id)
 
-        # disconnect MQTT
+        # stop asking for live spectra
+        self.b.get_object("spectrum_stream_but").set_active(False)
+
+        # give outbound messages a moment to get out, then disconnect MQTT
+        self.outbox.stop()
         self._stop_mqtt()
 
         # remove gui log handler
-        for h in lg.handlers:
-            if h.get_name() == "ui":
-                lg.removeHandler(h)
-                lg.debug("Shutting down")
+        uiLog = logPipe.get_handler("ui")
+        if uiLog is not None:
+            logPipe.remove_handler(uiLog)
+            lg.debug(f"Shutting down ({logPipe.dropped} log messages were dropped)")
 
         Gtk.Application.do_shutdown(self)
 
@@ -1676,12 +4528,10 @@ class App(Gtk.Application):
     def do_debug_tasks(self, *args, **kw_args):
         lg.debug("Hello World!")
         self.b.get_object("run_but").set_sensitive(True)
-        #self.load_live_data_webviews(load=False)
         msg = {'cmd':'debug'}
-        pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("cmd/uitl", pic_msg, qos=2).wait_for_publish()
+        self.commands.send(msg, topic="cmd/uitl")
         print(self.slot_config_store.variables)
-        self.draw_array()
+        self.draw_array(force=True)
 
     # fills the device selection bitmask text box based on the device selection treestore
     def open_dev_picker(self, button):
@@ -1704,26 +4554,27 @@ class App(Gtk.Application):
         """Pause experiment operation."""
         lg.info("Pausing run")
         # TODO: consider implimenting this
-        # self.mqttc.publish("gui/pause", "pause", qos=2).wait_for_publish()
+        # self.outbox.publish("gui/pause", "pause")
 
     def on_stop_button(self, button):
         """Stop experiment operation."""
         lg.info("Stopping run")
-        self.mqttc.publish(
-            "measurement/stop", pickle.dumps("stop"), qos=2
-        ).wait_for_publish()
+        self.outbox.publish("measurement/stop", self.wire.encode("measurement/stop", "stop"))
 
     def on_spectrum_button(self, button):
         """The user clicked the spectrum button"""
         lg.info("Getting spectrum")
+        # show the last one we have while the new one's measured
+        latest = None if self.calibration_history is None else self.calibration_history.latest("spectrum")
+        if (latest is not None) and (len(latest[1]) >= 2):
+            self.show_spectrum(latest[1], latest[0])
         msg = {}
         msg['cmd'] = 'spec'
         msg['le_address'] = self.config['solarsim']['address']
         msg['le_virt'] = self.config['solarsim']['virtual']
         msg['le_recipe'] = self.b.get_object("light_recipe").get_text()
-        pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
         self.want_spectrum = True
-        self.mqttc.publish("cmd/uitl", pic_msg, qos=2).wait_for_publish()
+        self.commands.send(msg, topic="cmd/uitl")
 
     def harvest_gui_data(self):
         """
@@ -1877,6 +4728,8 @@ class App(Gtk.Application):
             if ('iv_store' == id) or ('eqe_store' == id):  # for the device stores
                 # make sure the data frames are correct
                 self.do_dev_store_update_tasks(store)
+            elif 'slot_config_store' == id:
+                self.array_dirty = True
         except:
             lg.debug(f"Failed to load store: {id}")
             pass  # give up on this one store if we can't load it
@@ -1895,6 +4748,16 @@ class App(Gtk.Application):
             store = None
         return store
 
+    # turns a DeviceSelection into parallel lists of
+    # the system label of the slot and pad number for each selected device
+    def selection_to_some_lists(self, sel):
+        subi, pixi = sel.selected()
+        slots = self.slot_table()
+        some_lists = {}
+        some_lists['subs_names'] = np.asarray(slots['system_label'], dtype=str)[subi].tolist()
+        some_lists['sub_dev_nums'] = self.pixel_geometry.pads[self.pixel_geometry.rows(subi, pixi, slots['layout'])].tolist()
+        return some_lists
+
     def on_round_robin_button(self, button):
         button_label = button.get_label()
         this_type = "none"
@@ -1904,12 +4767,8 @@ class App(Gtk.Application):
         elif 'RTD' in button_label:
             lg.info("Measuring RTD temperatures...")
             this_type = "rtd"
-        iv_dev_txt = self.b.get_object("iv_devs").get_text()
-        iv_dev_num = int(iv_dev_txt, 16)
-        eqe_dev_txt = self.b.get_object("eqe_devs").get_text()
-        eqe_dev_num = int(eqe_dev_txt, 16)
-        any_dev_num = iv_dev_num|eqe_dev_num # combine the selections for the connectivity check
-        some_lists = self.bitmask_to_some_lists(hex(any_dev_num)) # TODO: update this
+        any_dev = self.iv_store.selection | self.eqe_store.selection  # combine the selections for the connectivity check
+        some_lists = self.selection_to_some_lists(any_dev)
         msg = {}
         msg['cmd'] = 'round_robin'
         msg['type'] = this_type
@@ -1917,8 +4776,7 @@ class App(Gtk.Application):
         msg['pads'] = some_lists['sub_dev_nums']
         msg['pcb'] = self.config['controller']['address']
         msg['smu'] = self.config['smu']
-        pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("cmd/uitl", pic_msg, qos=2).wait_for_publish()
+        self.commands.send(msg, topic="cmd/uitl")
 
     # this is for mux device toggle button in the utility view
     def on_device_toggle(self, button):
@@ -1928,7 +4786,7 @@ class App(Gtk.Application):
         """
         if self.all_mux_switches_open == True:
             self.all_mux_switches_open = False
-            active = self.iv_store.df
+            active = self.get_pixel_table(self.iv_store)
             if len(active) == 0:
                 lg.info("No devices selected for connection")
             else:
@@ -1939,8 +4797,7 @@ class App(Gtk.Application):
                 msg['pcb'] = self.config['controller']['address']
                 msg['pcb_virt'] = self.config['controller']['virtual']
                 msg['pcb_cmd'] = first_dev['mux_string']
-                pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-                self.mqttc.publish("cmd/uitl", pic_msg, qos=2).wait_for_publish()
+                self.commands.send(msg, topic="cmd/uitl")
         else:
             self.all_mux_switches_open = True
             lg.info("Disconnecting all devices")
@@ -1949,8 +4806,7 @@ class App(Gtk.Application):
             msg['pcb'] = self.config['controller']['address']
             msg['pcb_virt'] = self.config['controller']['virtual']
             msg['pcb_cmd'] = "s"
-            pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-            self.mqttc.publish("cmd/uitl", pic_msg, qos=2).wait_for_publish()
+            self.commands.send(msg, topic="cmd/uitl")
 
     def on_mode_toggle_button(self, button):
         """
@@ -1970,8 +4826,7 @@ class App(Gtk.Application):
         msg['pcb'] = self.config['controller']['address']
         msg['pcb_virt'] = self.config['controller']['virtual']
         msg['pcb_cmd'] = pcb_cmd
-        pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("cmd/uitl", pic_msg, qos=2).wait_for_publish()
+        self.commands.send(msg, topic="cmd/uitl")
 
     def on_health_button(self, button):
         lg.info("HEALTH CHECK INITIATED")
@@ -1990,8 +4845,7 @@ class App(Gtk.Application):
         if self.enable_solarsim == True:
             msg['le_address'] = self.config['solarsim']['address']
             msg['le_recipe'] = self.b.get_object("light_recipe").get_text()
-        pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("cmd/uitl", pic_msg, qos=2).wait_for_publish()
+        self.commands.send(msg, topic="cmd/uitl")
 
     def move_warning(self):
         if self.enable_stage == True:
@@ -2021,8 +4875,7 @@ class App(Gtk.Application):
             msg['pcb_virt'] = self.config['controller']['virtual']
             msg['stage_uri'] = self.config['stage']['uri']
             msg['stage_virt'] = self.config['stage']['virtual']
-            pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-            self.mqttc.publish("cmd/util", pic_msg, qos=2).wait_for_publish()
+            self.commands.send(msg, topic="cmd/util")
 
     def on_halt_button(self, button):
         """Emergency stop"""
@@ -2031,9 +4884,8 @@ class App(Gtk.Application):
         msg['cmd'] = 'estop'
         msg['pcb'] = self.config['controller']['address']
         msg['pcb_virt'] = self.config['controller']['virtual']
-        pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("cmd/uitl", pic_msg, qos=2).wait_for_publish()
-        self.mqttc.publish("measurement/stop", "stop", qos=2).wait_for_publish()
+        self.commands.send(msg, topic="cmd/uitl")
+        self.outbox.publish("measurement/stop", self.wire.encode("measurement/stop", "stop"))
 
     def on_mono_zero_button(self, button):
         """Sends Monochromator to 0nm"""
@@ -2041,8 +4893,7 @@ class App(Gtk.Application):
         msg['cmd'] = 'mono_zero'
         msg['mono_address'] = self.config['monochromator']['address']
         msg['mono_virt'] = self.config['monochromator']['virtual']
-        pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("cmd/util", pic_msg, qos=2).wait_for_publish()
+        self.commands.send(msg, topic="cmd/util")
 
     def on_stage_read_button(self, button):
         """Read the current stage position."""
@@ -2052,8 +4903,7 @@ class App(Gtk.Application):
         msg['pcb_virt'] = self.config['controller']['virtual']
         msg['stage_uri'] = self.config['stage']['uri']
         msg['stage_virt'] = self.config['stage']['virtual']
-        pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("cmd/util", pic_msg, qos=2).wait_for_publish()
+        self.commands.send(msg, topic="cmd/util")
 
     def on_goto_button(self, button):
         """Goto stage position."""
@@ -2071,8 +4921,7 @@ class App(Gtk.Application):
             msg['stage_uri'] = self.config['stage']['uri']
             msg['stage_virt'] = self.config['stage']['virtual']
             msg['pos'] = pos
-            pic_msg = pickle.dumps(msg)
-            self.mqttc.publish("cmd/util", pic_msg, qos=2).wait_for_publish()
+            self.commands.send(msg, topic="cmd/util")
 
     def on_run_button(self, button):
         """Send run info to experiment orchestrator via MQTT."""
@@ -2104,12 +4953,22 @@ class App(Gtk.Application):
                 with open(autosave_destination, "wb") as f:
                     pickle.dump(gui_data, f, protocol=pickle.HIGHEST_PROTOCOL)
 
-            msg = {"cmd":"run", "args": self.gui_to_args(gui_data), "config": self.config}
-            pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
+            msg = {"cmd":"run", "args": self.gui_to_args(gui_data), "config_hash": self.config_hash}
+            if self.pixel_overlay.clear():  # a fresh run gets a fresh overlay
+                GLib.timeout_add(33, self.flush_pixel_overlay)
+            for plot, area in self.live_plots.values():  # and fresh live plots
+                plot.clear()
+            pic_msg = self.wire.encode("measurement/run", msg)
             # publish the run message
             lg.info(f"Starting new run: {run_name}")
             self.b.get_object("run_but").set_sensitive(False)  # prevent multipress
-            self.mqttc.publish("measurement/run", pic_msg, qos=2).wait_for_publish()
+            self.outbox.publish("measurement/run", pic_msg, callback=self.on_run_published)
+
+    # gives the run button back if a run/calibration message never made it out
+    def on_run_published(self, topic, ok):
+        if ok == False:
+            lg.error(f"Failed to send {topic} message to the backend")
+            self.b.get_object("run_but").set_sensitive(True)
 
     # makes the gui dict more consumable for a backend
     def gui_to_args(self, gui_dict):
@@ -2140,7 +4999,7 @@ class App(Gtk.Application):
         args['pixel_data_object_names'] = []
 
         # the potential pixel data objects we'll send (empty ones are not sent)
-        dfs = [self.eqe_store.df, self.iv_store.df]
+        dfs = [self.get_pixel_table(self.eqe_store), self.get_pixel_table(self.iv_store)]
 
         # whitelist some pixel data frame cols for the saver.
         # only these cols should get saved to file
@@ -2185,10 +5044,10 @@ class App(Gtk.Application):
             self.b.get_object("run_but").set_sensitive(False)  # prevent run
             lg.info(f"Starting EQE calibration")
 
-            msg = {"cmd":"run", "args": self.gui_to_args(self.harvest_gui_data()), "config": self.config}
-            pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
+            msg = {"cmd":"run", "args": self.gui_to_args(self.harvest_gui_data()), "config_hash": self.config_hash}
+            pic_msg = self.wire.encode("measurement/calibrate_eqe", msg)
 
-            self.mqttc.publish("measurement/calibrate_eqe", pic_msg, qos=2).wait_for_publish()
+            self.outbox.publish("measurement/calibrate_eqe", pic_msg, callback=self.on_run_published)
             # check for calibration/eqe timestamp
 
     def on_cal_psu_button(self, button):
@@ -2198,10 +5057,10 @@ class App(Gtk.Application):
             self.b.get_object("run_but").set_sensitive(False)  # prevent run
             lg.info(f"Starting bias light LED calibration")
 
-            msg = {"cmd":"run", "args": self.gui_to_args(self.harvest_gui_data()), "config": self.config}
-            pic_msg = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
+            msg = {"cmd":"run", "args": self.gui_to_args(self.harvest_gui_data()), "config_hash": self.config_hash}
+            pic_msg = self.wire.encode("measurement/calibrate_psu", msg)
 
-            self.mqttc.publish("measurement/calibrate_psu", pic_msg, qos=2).wait_for_publish()
+            self.outbox.publish("measurement/calibrate_psu", pic_msg, callback=self.on_run_published)
 
     # called on right click to log before the menu is drawn
     def on_log_pre_popup(self, text_view, menu):
@@ -2217,6 +5076,58 @@ class App(Gtk.Application):
     def clear_log(self, widget):
         self.logTB.set_text("")
 
+    # the user changed the log pane filters
+    # the default ones show the live log, anything else shows what matches from the archive
+    def on_log_filter_changed(self, widget):
+        level = int(self.b.get_object("___log_level_filter").get_active_id() or logging.INFO)
+        source = self.b.get_object("___log_source_filter").get_active_id() or None
+        text = self.b.get_object("___log_search").get_text().strip() or None
+        time_entry = self.b.get_object("___log_time")
+        when = time_entry.get_text().strip()
+        since = None
+        if when != "":
+            try:
+                if re.fullmatch(r"\d{1,2}:\d{2}(:\d{2})?", when):
+                    clock = dt.datetime.strptime(when, "%H:%M:%S" if when.count(":") == 2 else "%H:%M").time()
+                    since = dt.datetime.combine(dt.date.today(), clock).timestamp()
+                else:
+                    since = dt.datetime.fromisoformat(when).timestamp()
+                time_entry.get_style_context().remove_class("error")
+            except ValueError:
+                time_entry.get_style_context().add_class("error")
+                return
+
+        if (level == logging.INFO) and (source is None) and (text is None) and (since is None):
+            self.ltv.set_buffer(self.logTB)
+            self.logTB.place_cursor(self.logTB.get_end_iter())
+            self.ltv.scroll_to_mark(self.logTB.get_insert(), 0, False, 0, 1)
+        else:
+            self.log_browser.set_filter(level=level, source=source, text=text)
+            if since is None:
+                self.log_browser.show_end()
+            else:
+                self.log_browser.show_from(since)
+            buf = self.log_browser.buffer
+            self.ltv.set_buffer(buf)
+            buf.place_cursor(buf.get_end_iter() if since is None else buf.get_start_iter())
+            self.ltv.scroll_to_mark(buf.get_insert(), 0, False, 0, 1 if since is None else 0)
+
+    # loads more of the archive when a filtered log pane is scrolled to either end
+    def on_log_edge_reached(self, scrolled_window, pos):
+        buf = self.log_browser.buffer
+        if self.ltv.get_buffer() != buf:
+            return
+        if pos == Gtk.PositionType.TOP:
+            mark = buf.create_mark(None, buf.get_start_iter(), False)  # ends up after what gets put before it
+            if self.log_browser.older():
+                self.ltv.scroll_to_mark(mark, 0, True, 0, 0)
+            buf.delete_mark(mark)
+        elif pos == Gtk.PositionType.BOTTOM:
+            mark = buf.create_mark(None, buf.get_end_iter(), True)  # stays before what gets added after it
+            if self.log_browser.newer():
+                self.ltv.scroll_to_mark(mark, 0, True, 0, 1)
+            buf.delete_mark(mark)
+
     def on_smart_mode_activate(self, button):
         self.update_gui()
     
@@ -2224,34 +5135,40 @@ class App(Gtk.Application):
     def on_stack_change(self, stack, child):
         active_title = stack.child_get_property(stack.get_visible_child(),'title')
         if active_title == 'Live Data':
-            self.load_live_data_webviews(load=True)
+            self.webviews.show_only(self.wvids)
+        elif active_title == 'Custom View':
+            self.webviews.show_only(["custom_wv"])
         else:
-            self.load_live_data_webviews(load=False)
-        
-        if active_title == 'Custom View':
-            self.load_custom_webview(load=True)
-        else:
-            self.load_custom_webview(load=False)
+            self.webviews.show_only([])
         
         if active_title == 'Array Overview':
             self.draw_array()
+
+        self.update_plot_rates()
         
         self.b.get_object("pane").set_position(0)  # move the pane handle to the top every stack change
 
     # pause/unpause plots
     def on_plotter_switch(self, switch, state):
-        pic_msg = pickle.dumps(not state, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("plotter/pause", pic_msg, qos=2).wait_for_publish()
+        self.live_plots_paused = not state
+        pic_msg = self.wire.encode("plotter/pause", not state)
+        self.outbox.publish("plotter/pause", pic_msg)
+        if switch is not None:
+            self.update_plot_rates()
 
     # invert voltage plots switch
     def on_voltage_switch(self, switch, state):
-        pic_msg = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("plotter/invert_voltage", pic_msg, qos=2).wait_for_publish()
+        self.invert_voltage = state
+        self.set_live_plot_signs()
+        pic_msg = self.wire.encode("plotter/invert_voltage", state)
+        self.outbox.publish("plotter/invert_voltage", pic_msg)
 
     # invert current plots switch
     def on_current_switch(self, switch, state):
-        pic_msg = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
-        self.mqttc.publish("plotter/invert_current", pic_msg, qos=2).wait_for_publish()
+        self.invert_current = state
+        self.set_live_plot_signs()
+        pic_msg = self.wire.encode("plotter/invert_current", state)
+        self.outbox.publish("plotter/invert_current", pic_msg)
 
     # reads various gui item states and sets others accordingly
     # def needs to be called after loading a gui state file
@@ -2347,6 +5264,387 @@ def merge_dicts(target_list, replace_lists=True):
     return ret
 
 
+# a stable hash of a configuration dictionary's content
+def config_digest(config):
+    # yaml allows non-string keys, json sorting needs them all to be strings
+    def stringify_keys(obj):
+        if isinstance(obj, dict):
+            return {str(k): stringify_keys(v) for k, v in obj.items()}
+        elif isinstance(obj, (list, tuple)):
+            return [stringify_keys(v) for v in obj]
+        return obj
+    canonical = json.dumps(stringify_keys(config), sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# finds the fastest time (in seconds) of a few runs of fn
+def best_time(fn, number=10, repeat=5):
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+# makes a pixel dataframe shaped like the ones the device stores build, for benchmarking
+def example_pixel_frame(n_pix, variables=('Variable',)):
+    rng = np.random.default_rng(0)
+    rows = []
+    for i in range(n_pix):
+        subi = i // 6
+        pixi = i % 6
+        system_label = f"{chr(ord('A') + subi % 26)}{subi // 26}"
+        por = list(rng.uniform(-10, 10, 2))
+        sor = [float(subi * 30), 0.0]
+        loc = [s + p for s, p in zip(sor, por)]
+        row = {'system_label': system_label, 'user_label': 'sample', 'label': f"{system_label}_sample", 'substrate_index': subi,
+               'layout_pixel_index': pixi, 'pixel_offset_raw': por, 'pixel_offset': por, 'substrate_offset_raw': sor,
+               'substrate_offset': sor, 'loc_raw': loc, 'loc': loc, 'layout': 'one large', 'area': 0.25, 'dark_area': 0.3087,
+               'mux_index': 6 - pixi, 'mux_string': f"s{system_label}{6 - pixi}", 'user_vars': {v: 'x' for v in variables}}
+        for v in variables:
+            row[v] = 'x'
+        rows.append(row)
+    df = pd.DataFrame(rows, dtype=object)
+    df.index.name = 'IV'
+    return df
+
+
+# compares the wire formats for our real message shapes
+def bench_wire_formats():
+    config = example_config()
+    spec = np.linspace(300, 1100, 2048), np.random.default_rng(0).uniform(0, 6e4, 2048)
+    messages = {}
+    messages['config/<hash>'] = config
+    messages['measurement/run'] = {"cmd": "run", "args": {"run_name": "bench", "IV_stuff": example_pixel_frame(48), "EQE_stuff": example_pixel_frame(12)}, "config_hash": config_digest(config)}
+    messages['calibration/spectrum'] = {'timestamp': time.time(), 'data': [spec[0], spec[1]]}
+    messages['measurement/log'] = {'level': logging.INFO, 'msg': "Measuring device A1 pixel 3"}
+    messages['response/pos'] = {'pos': [123.4567, 89.0123]}
+
+    formats = {'pickle': WireFormat('pickle')}
+    if msgpack is None:
+        print("msgpack is not installed, only pickle can be measured")
+    else:
+        formats['msgpack'] = WireFormat('msgpack')
+
+    print(f"{'message':<24}{'format':<10}{'bytes':>10}{'encode [us]':>14}{'decode [us]':>14}")
+    for topic, msg in messages.items():
+        for name, wf in formats.items():
+            payload = wf.encode(topic, msg)
+            t_enc = best_time(lambda: wf.encode(topic, msg))
+            t_dec = best_time(lambda: wf.decode(topic, payload))
+            print(f"{topic:<24}{name:<10}{len(payload):>10}{t_enc*1e6:>14.1f}{t_dec*1e6:>14.1f}")
+
+
+# compares pickling the pixel dataframes with packing them column by column
+def bench_pixel_tables():
+    if msgpack is None:
+        print("msgpack is not installed, skipping the pixel table benchmark")
+        return
+    print(f"{'pixels':>8}{'format':>10}{'bytes':>12}{'encode [ms]':>14}{'decode [ms]':>14}")
+    for n in [1000, 10000, 100000]:
+        df = example_pixel_frame(n)
+        pic = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        t_enc = best_time(lambda: pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL), number=1)
+        t_dec = best_time(lambda: pickle.loads(pic), number=1)
+        print(f"{n:>8}{'pickle':>10}{len(pic):>12}{t_enc*1e3:>14.2f}{t_dec*1e3:>14.2f}")
+        packed = pack_pixel_table(df)
+        t_enc = best_time(lambda: pack_pixel_table(df), number=1)
+        t_dec = best_time(lambda: unpack_pixel_table(packed), number=1)
+        print(f"{n:>8}{'columnar':>10}{len(packed):>12}{t_enc*1e3:>14.2f}{t_dec*1e3:>14.2f}")
+
+
+# loads the example config, for benchmarking
+def example_config():
+    with open(pathlib.Path(__file__).parent / "example_config.yaml", "r") as f:
+        return yaml.load(f, Loader=yaml.FullLoader)
+
+
+# shows how building the pixel dataframe scales with the number of selected pixels
+def bench_pixel_table_build():
+    geometry = PixelGeometry(example_config()['substrates']['layouts'])
+    variables = ['Variable']
+    print(f"{'pixels':>8}{'build [ms]':>14}")
+    for n in [100, 1000, 10000, 100000]:
+        ns = n // 6
+        slots = {}
+        slots['system_label'] = [f"{chr(ord('A') + i % 26)}{i // 26}" for i in range(ns)]
+        slots['user_label'] = [f"s{i}" for i in range(ns)]
+        slots['layout'] = ['one large'] * ns
+        slots['position'] = np.random.default_rng(0).uniform(-100, 100, (ns, 2))
+        slots['vars'] = [['x']] * ns
+        subi = np.repeat(np.arange(ns), 6)
+        pixi = np.tile(np.arange(6), ns)
+        t = best_time(lambda: geometry.pixel_table(subi, pixi, slots, 2, variables), number=1, repeat=3)
+        print(f"{ns*6:>8}{t*1e3:>14.2f}")
+
+
+# the original per cell make_meshgrids, kept to benchmark against
+def make_meshgrids_loop(counts, spacings, polarities, lab_flips):
+    d = len(counts)
+    if d == 1:
+        label_starts = ['A']
+    elif d == 2:
+        label_starts = ['1','A']
+    else:
+        label_starts = ['a','1','A']
+    ranges = [np.array(range(x)) for x in counts]
+    label_ranges =    [r+ord(label_starts[i]) for i,r in enumerate(ranges)]
+    location_ranges = [r*spacings[i] for i,r in enumerate(ranges)]
+    location_ranges = [(r-r.max()/2)*(-2*polarities[i]+1) for i,r in enumerate(location_ranges)]
+    label_meshgrid = np.empty(list(counts), dtype=np.dtype(f'U{d}'))
+    pos_meshgrid = np.empty(list(counts), dtype=object)
+    for idx, x in np.ndenumerate(label_meshgrid):
+        label = ''
+        pos = []
+        for j,i in enumerate(idx):
+            label += chr(label_ranges[j][i])
+            pos.append(location_ranges[j][i])
+        label_meshgrid[idx] = label
+        pos_meshgrid[idx] = pos
+    for i, t in enumerate(lab_flips):
+        if t == True:
+            label_meshgrid = np.flip(label_meshgrid, i)
+    return label_meshgrid, pos_meshgrid
+
+
+# slot array generation and label lookup, old versus new
+def bench_meshgrids():
+    print(f"{'counts':>16}{'slots':>8}{'loop [ms]':>12}{'vectorized [ms]':>17}{'dict lookup [ms]':>18}{'indexed lookup [ms]':>21}")
+    for counts in [[4], [2, 4], [30, 30], [50, 60], [8, 10, 12], [10, 20, 25]]:
+        d = len(counts)
+        args = (counts, [30.0]*d, [False]*d, [True] + [False]*(d-1))
+        t_loop = best_time(lambda: make_meshgrids_loop(*args), number=1, repeat=3)
+        t_vec = best_time(lambda: make_meshgrids(*args), number=1, repeat=3)
+
+        labels, positions = make_meshgrids_loop(*args)
+        old = dict(zip(list(labels.flat), list(positions.flat)))
+        new = SlotLocations(*make_meshgrids(*args))
+        assert all(np.array_equal(old[k], new[k]) for k in old)
+        wanted = sorted(str(k) for k in old)  # plain strs, like the labels callers pass in from the slot config store
+        t_dict = best_time(lambda: [old[k] for k in wanted], number=1, repeat=3)
+        t_index = best_time(lambda: new.take(wanted), number=1, repeat=3)
+        print(f"{str(counts):>16}{len(new):>8}{t_loop*1e3:>12.2f}{t_vec*1e3:>17.3f}{t_dict*1e3:>18.3f}{t_index*1e3:>21.3f}")
+
+
+# array overview svg size, build and parse time on a 20x20 array, copied layouts versus <defs>/<use>
+def bench_array_drawing():
+    config = example_config()
+    spacing = [30.0, 30.0]
+    angle = 0
+    layout_bodies = {}
+    for name, val in config['substrates']['layouts'].items():
+        if val.get('enabled') == True:
+            d, _ = draw_layout(val['pads'], val['areas'], val['locations'], val['shapes'], val['size'], spacing, name, angle)
+            layout_bodies[name] = svg_body(d.asSvg())
+    label_grid, position_grid = make_meshgrids([20, 20], spacing, [False, False], [False, False])
+    locations = SlotLocations(label_grid, position_grid)
+    labels = locations.labels.tolist()
+    names = list(layout_bodies.keys())
+    font_size = 24
+    vb = array_view_box(locations.positions, spacing, angle, np.full(len(labels), 2*font_size*0.6), font_size)
+    print(f"{'composition':>12}{'layouts':>9}{'svg [kB]':>10}{'build [ms]':>12}{'parse [ms]':>12}")
+    for n_layouts in [1, len(names)]:
+        layouts = [names[i % n_layouts] for i in range(len(labels))]
+        for symbols in [False, True]:
+            def build():
+                return compose_array_drawing(labels, layouts, locations.positions, layout_bodies, angle, font_size, vb, symbols=symbols).asSvg()
+            svg = build()
+            t_build = best_time(build, number=1, repeat=3)
+            try:
+                t_parse = best_time(lambda: Rsvg.Handle.new_from_data(svg.encode()), number=1, repeat=3)
+            except Exception:
+                t_parse = float('nan')  # no librsvg here
+            print(f"{'use' if symbols else 'copy':>12}{n_layouts:>9}{len(svg)/1e3:>10.1f}{t_build*1e3:>12.2f}{t_parse*1e3:>12.2f}")
+
+
+# layout drawing time for all the example config layouts: drawn from scratch, then from a warm disk cache
+def bench_layout_cache():
+    import tempfile
+    config = example_config()
+    layouts = {name: val for name, val in config['substrates']['layouts'].items() if val.get('enabled') == True}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        def load_all():
+            for name, val in layouts.items():
+                LayoutDrawing(name, val, [30.0, 30.0], 90, cache_dir).svg
+        t_cold = best_time(load_all, number=1, repeat=1)
+        t_warm = best_time(load_all, number=1, repeat=3)
+    print(f"{'layouts':>8}{'cold [ms]':>12}{'warm [ms]':>12}")
+    print(f"{len(layouts):>8}{t_cold*1e3:>12.2f}{t_warm*1e3:>12.2f}")
+
+
+# how long the gtk side of the pixel overlay takes per frame for different update rates
+def bench_pixel_overlay():
+    geometry = PixelGeometry(example_config()['substrates']['layouts'])
+    label_grid, position_grid = make_meshgrids([30, 30], [30.0, 30.0], [False, False], [False, False])
+    labels = label_grid.ravel().tolist()
+    index = ArrayIndex(position_grid.reshape(-1, 2), [30.0, 30.0], ['one large']*len(labels), geometry, labels)
+    view = ArrayView(index.centers, [30.0, 30.0], 0, labels, array_view_box(index.centers, [30.0, 30.0], 0, np.zeros(len(labels)), 24))
+    view.fit(1000, 1000)
+    overlay = PixelOverlay()
+    overlay.bind(index)
+    keys = list(index.ids.keys())
+    rng = np.random.default_rng(0)
+    states = list(PixelOverlay.states.keys())
+    print(f"{'pixels':>8}{'updates/frame':>15}{'frame [ms]':>12}")
+    for n in [10, 100, 1000]:
+        def frame():
+            for k in rng.integers(0, len(keys), n):
+                overlay.update(*keys[k], state=states[k % len(states)])
+            for i in overlay.take():
+                view.pixel_screen_box(index, i)
+        t = best_time(frame, number=5)
+        print(f"{len(keys):>8}{n:>15}{t*1e3:>12.2f}")
+
+
+# device selection operations at different array sizes
+def bench_device_selection():
+    print(f"{'devices':>8}{'toggle [us]':>14}{'hex in [ms]':>14}{'hex out [ms]':>14}{'popcount [us]':>15}{'union [ms]':>13}")
+    rng = np.random.default_rng(0)
+    for n in [1000, 10000, 100000]:
+        sizes = [6] * (n // 6)
+        a = DeviceSelection(sizes)
+        a.set_bits(rng.random(a.n_bits) < 0.5)
+        b = DeviceSelection(sizes)
+        b.set_bits(rng.random(b.n_bits) < 0.5)
+        text = a.hex_text()
+
+        def toggle():
+            a.set_device(3, 2, not a.is_set(20))
+            a.hex_text()
+
+        def hex_out():
+            a.dirty.update(range(len(sizes)))
+            a.hex_text()
+
+        t_toggle = best_time(toggle, number=100)
+        t_in = best_time(lambda: b.set_hex(text), number=1)
+        t_out = best_time(hex_out, number=1)
+        t_pop = best_time(a.popcount, number=100)
+        t_union = best_time(lambda: a | b, number=1)
+        print(f"{a.n_bits:>8}{t_toggle*1e6:>14.1f}{t_in*1e3:>14.2f}{t_out*1e3:>14.2f}{t_pop*1e6:>15.1f}{t_union*1e3:>13.2f}")
+
+
+# spectrum plot decimation and drawing time for different spectrum lengths
+def bench_spectrum_plot():
+    print(f"{'points':>9}{'drawn':>7}{'decimate [ms]':>15}{'draw [ms]':>11}")
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, 640, 480)
+    cr = cairo.Context(surface)
+    plot = SpectrumPlot()
+    pw = 640 - plot.margins[0] - plot.margins[1]
+    for n in [2048, 100000, 1000000]:
+        x = np.linspace(300, 1100, n)
+        y = 6e4*np.exp(-((x - 700)/150)**2) + np.random.default_rng(0).normal(0, 500, n)
+        plot.set_data(x, y)
+        t_dec = best_time(lambda: decimate_minmax(x, y, pw), number=3)
+        t_draw = best_time(lambda: plot.draw(cr, 640, 480), number=3)
+        print(f"{n:>9}{len(plot.trace(pw)[0]):>7}{t_dec*1e3:>15.2f}{t_draw*1e3:>11.2f}")
+
+
+# live plot message handling and per-frame trace preparation for a full plot
+def bench_live_plot():
+    print(f"{'points/msg':>11}{'add [us]':>10}{'lines [ms]':>12}")
+    for n in [1, 50, 1000]:
+        plot = LivePlot("Time [s]", "Voltage [V]", 2, 0)
+        t = np.arange(n, dtype=float)
+        def add():
+            for k in range(10):
+                rows = np.stack([np.sin(t), np.cos(t), t, np.zeros(n)], axis=1).tolist()
+                plot.add({'data': rows, 'pixel': {'label': f"A{k}", 'pixel': 1}, 'sweep': None})
+        t_add = best_time(add, number=5)/10
+        add()
+        t_lines = best_time(lambda: plot.lines(600), number=5)
+        print(f"{n:>11}{t_add*1e6:>10.1f}{t_lines*1e3:>12.2f}")
+
+
+# calibration history lookups as it grows
+def bench_calibration_history():
+    import tempfile
+    print(f"{'spectra':>8}{'append [us]':>13}{'latest [us]':>13}{'last 10 [us]':>14}")
+    x = np.linspace(300, 1100, 2048)
+    with tempfile.TemporaryDirectory() as root:
+        history = CalibrationHistory(root)
+        t0 = time.time()
+        stored = 0
+        for n in [100, 1000, 10000]:
+            start = time.perf_counter()
+            for i in range(stored, n):
+                history.append("spectrum", t0 + i, [x, np.sin(x + i)])
+            t_append = (time.perf_counter() - start)/(n - stored)
+            stored = n
+            t_latest = best_time(lambda: history.latest("spectrum")[1][1].sum(), number=100)
+            t_before = best_time(lambda: [a[1].sum() for t, a in history.before("spectrum", math.inf, 10)], number=100)
+            print(f"{n:>8}{t_append*1e6:>13.1f}{t_latest*1e6:>13.1f}{t_before*1e6:>14.1f}")
+
+
+# how long a log call holds up its caller, with a slow handler behind the pipeline, and flood control throughput
+def bench_log_pipeline():
+    class SlowHandler(logging.Handler):
+        def emit(self, record):
+            time.sleep(0.001)
+
+    logger = logging.getLogger("bench")
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    print(f"{'handler path':>14}{'per call [us]':>15}")
+    for name in ["direct", "pipeline"]:
+        logger.handlers.clear()
+        if name == "direct":
+            logger.addHandler(SlowHandler())
+        else:
+            pipe = LogPipeline([SlowHandler()], maxsize=100000)
+            logger.addHandler(pipe)
+        t = best_time(lambda: [logger.info("message %d", i) for i in range(100)], number=1, repeat=3)/100
+        print(f"{name:>14}{t*1e6:>15.1f}")
+    pipe.stop()
+    logger.handlers.clear()
+
+    flood = FloodControl()
+    records = [logging.makeLogRecord({'msg': f"line {i % 3}", 'levelno': logging.INFO, 'source': "backend"}) for i in range(10000)]
+    t = best_time(lambda: [flood.process(r) for r in records], number=1)
+    print(f"flood control: {len(records)/t:.0f} records/s, {flood.dropped} dropped")
+
+
+# log archive write rate and query times as it fills up
+def bench_log_archive():
+    import tempfile
+    rng = np.random.default_rng(0)
+    words = ["pixel", "sweep", "voltage", "current", "stage", "moving", "done", "error", "timeout", "calibration"]
+    print(f"{'records':>9}{'insert [us/rec]':>17}{'newest [ms]':>13}{'warnings [ms]':>15}{'search [ms]':>13}{'go to time [ms]':>17}")
+    with tempfile.TemporaryDirectory() as root:
+        archive = LogArchive(pathlib.Path(root) / "log.sqlite3", batch_size=5000)
+        t0 = time.time()
+        stored = 0
+        for n in [10000, 100000, 1000000]:
+            records = []
+            for i in range(stored, n):
+                msg = " ".join(words[k] for k in rng.integers(0, len(words), 5)) + f" {i}"
+                records.append(logging.makeLogRecord({'msg': msg, 'levelno': [10, 20, 20, 20, 30][i % 5], 'created': t0 + i/100}))
+            start = time.perf_counter()
+            for record in records:
+                archive.emit(record)
+            archive.flush()
+            t_insert = (time.perf_counter() - start)/(n - stored)
+            stored = n
+            t_newest = best_time(lambda: archive.query(level=logging.INFO, limit=500), number=3)
+            t_warn = best_time(lambda: archive.query(level=logging.WARNING, limit=500), number=3)
+            t_search = best_time(lambda: archive.query(text="timeout calib", limit=500), number=3)
+            t_time = best_time(lambda: archive.query(since=t0 + n/200, limit=500), number=3)
+            print(f"{n:>9}{t_insert*1e6:>17.1f}{t_newest*1e3:>13.2f}{t_warn*1e3:>15.2f}{t_search*1e3:>13.2f}{t_time*1e3:>17.2f}")
+
+
+# runs all the performance benchmarks
+def run_benchmarks():
+    bench_wire_formats()
+    bench_pixel_tables()
+    bench_pixel_table_build()
+    bench_device_selection()
+    bench_meshgrids()
+    bench_array_drawing()
+    bench_layout_cache()
+    bench_pixel_overlay()
+    bench_spectrum_plot()
+    bench_calibration_history()
+    bench_live_plot()
+    bench_log_pipeline()
+    bench_log_archive()
+
+
 if __name__ == "__main__":
     app = App()
     app.run(sys.argv)